@@ -1,24 +1,199 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator, field_serializer
 from typing import Dict, List, Union, Optional
 from faiss_rag import StockAnalysisRAG
+from lazy import LazyResource
+from volume_bayes import DEFAULT_QUANTILES, VolumeBayesEngine
+from sector_analytics import WEIGHTINGS, SectorAnalytics
 from typing import Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+
+# Initialize analyzer; its index, price data and clients load on first use
+FAISS_INDEX_PATH = "stock_index.faiss"
+analyzer = StockAnalysisRAG(FAISS_INDEX_PATH)
+volume_bayes = LazyResource(lambda: VolumeBayesEngine(analyzer.prices))
+sector_analytics = LazyResource(lambda: SectorAnalytics(analyzer.prices))
+
+# Set WARMUP_ON_STARTUP=1 to load everything before serving instead of on the first request
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0") == "1"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        await asyncio.to_thread(analyzer.warm_up)
+    yield
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Stock Analysis API",
     description="API for stock price analysis using FAISS RAG",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize analyzer
-FAISS_INDEX_PATH = "stock_index.faiss"
-analyzer = StockAnalysisRAG(FAISS_INDEX_PATH)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/prices/{symbol}")
+async def get_prices(symbol: str):
+    prices = await asyncio.to_thread(analyzer.get_quarterly_averages, symbol.upper())
+    if prices.empty:
+        raise HTTPException(status_code=404, detail=f"No price data for {symbol}")
+    return {"symbol": symbol.upper(), "pricesDF": prices.to_dict()}
+
+
+@app.get("/indicators/{symbol}")
+async def get_indicators(symbol: str, start: Optional[str] = None, end: Optional[str] = None):
+    """Precomputed technical indicators (SMA, EMA, RSI, ATR, Bollinger, volatility, drawdown) for a date range."""
+    symbol = symbol.upper()
+
+    def lookup():
+        # analyzer.indicators is computed for every symbol on first use
+        if symbol not in analyzer.prices:
+            raise HTTPException(status_code=404, detail=f"No price data for {symbol}")
+        indicators = analyzer.indicators
+        try:
+            frame = indicators.get(symbol, start, end)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="start and end must be ISO dates (YYYY-MM-DD)")
+        return indicators.latest(symbol), frame
+
+    latest, frame = await asyncio.to_thread(lookup)
+    return {"symbol": symbol, "latest": latest, "indicators": records(frame)}
+
+
+@app.get("/metrics/llm-cache")
+async def llm_cache_metrics():
+    """Hit rate and tokens saved by the LLM response cache since startup"""
+    return analyzer.llm_cache.metrics()
+
+
+def parse_quantiles(quantiles: Optional[str]) -> List[float]:
+    if not quantiles:
+        return list(DEFAULT_QUANTILES)
+    try:
+        values = [float(q) for q in quantiles.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid quantiles: {quantiles}")
+    if any(not 0 <= q <= 1 for q in values):
+        raise HTTPException(status_code=422, detail="Quantiles must be between 0 and 1")
+    return values
+
+
+def records(frame) -> List[Dict[str, Any]]:
+    """DataFrame -> JSON records, with NaN (e.g. no high-volume bars) as null."""
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+@app.get("/analytics/volume-price")
+async def volume_price_probabilities(quantiles: Optional[str] = None, symbols: Optional[str] = None,
+                                     by: str = "symbol"):
+    """
+    P(price increase | high volume) for every symbol (or sector, with by=sector),
+    for each comma-separated volume quantile.
+    """
+    if by not in ("symbol", "sector"):
+        raise HTTPException(status_code=422, detail="by must be 'symbol' or 'sector'")
+    quantile_list = parse_quantiles(quantiles)
+    symbol_list = [s.strip().upper() for s in symbols.split(",")] if symbols else None
+
+    def compute():
+        # The first call builds the engine from the price store, so it stays off the event loop too
+        engine = volume_bayes.get()
+        if by == "sector":
+            return engine.by_sector(quantile_list)
+        return engine.conditional_matrix(quantile_list, symbol_list)
+
+    frame = await asyncio.to_thread(compute)
+    return {"by": by, "quantiles": quantile_list, "results": records(frame)}
+
+
+@app.get("/analytics/volume-price/{symbol}/rolling")
+async def rolling_volume_price_probabilities(symbol: str, quantile: float = 0.75, window: int = 26):
+    """P(price increase | high volume) over the trailing `window` weeks at every bar of one symbol."""
+    symbol = symbol.upper()
+    if not 0 <= quantile <= 1 or window < 1:
+        raise HTTPException(status_code=422, detail="quantile must be in [0, 1] and window >= 1")
+
+    def compute():
+        if symbol not in analyzer.prices:
+            return None
+        return volume_bayes.get().rolling(quantile, window, [symbol])
+
+    frame = await asyncio.to_thread(compute)
+    if frame is None:
+        raise HTTPException(status_code=404, detail=f"No price data for {symbol}")
+    return {"symbol": symbol, "quantile": quantile, "window": window, "results": records(frame)}
+
+
+@app.get("/analytics/sectors")
+async def sector_overview(weighting: str = "dollar_volume", granularity: str = "weekly"):
+    """
+    Sector indices (base 100), relative strength vs. the whole market, volatility,
+    correlations and trailing 13-week returns, precomputed per data version.
+    """
+    if weighting not in WEIGHTINGS:
+        raise HTTPException(status_code=422, detail=f"weighting must be one of {list(WEIGHTINGS)}")
+    if granularity not in ("weekly", "quarterly"):
+        raise HTTPException(status_code=422, detail="granularity must be 'weekly' or 'quarterly'")
+    analytics = await asyncio.to_thread(lambda: sector_analytics.get().get(weighting))
+    return {
+        "weighting": weighting,
+        "granularity": granularity,
+        "sectors": analytics["sectors"],
+        "members": analytics["members"],
+        "index": records(analytics[f"{granularity}_index"].reset_index()),
+        "relative_strength": records(analytics[f"{granularity}_relative_strength"].reset_index()),
+        "volatility": json.loads(analytics["volatility"].to_json(orient="index")),
+        "correlation": json.loads(analytics["correlation"].to_json(orient="index")),
+        "trailing_return": json.loads(analytics["trailing_return"].to_json()),
+        "trailing_excess_return": json.loads(analytics["trailing_excess_return"].to_json()),
+    }
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/analyze/{symbol}/stream")
+def stream_analysis(symbol: str):
+    """
+    Server-sent events: "prices" (quarterly averages as records), then "analysis" and
+    "narrative" tokens as they are generated, then "done" (or "error").
+    """
+    symbol = symbol.upper()
+    if analyzer.get_quarterly_averages(symbol).empty:
+        raise HTTPException(status_code=404, detail=f"No price data for {symbol}")
+
+    def events():
+        try:
+            for event, data in analyzer.stream_stock_insights(symbol):
+                if event == "prices":
+                    data = json.loads(data.to_json(orient="records", date_format="iso"))
+                yield sse_event(event, data)
+            yield sse_event("done", "")
+        except Exception as e:
+            logger.error(f"Error streaming analysis for {symbol}: {str(e)}")
+            yield sse_event("error", str(e))
+
+    # Sync generator: Starlette iterates it in a worker thread, so blocking LLM reads don't stall the loop
+    return StreamingResponse(events(), media_type="text/event-stream")
 
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from storage import CACHE_DIR, DAY, connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# Tracking parameters that syndication and social shares append to the same URL
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|cmpid|guccounter)$", re.IGNORECASE)
+# NewsAPI truncates content with a "[+1234 chars]" marker whose number varies between copies
+_TRUNCATION_MARKER = re.compile(r"\[\+\d+ chars\]")
+SIMHASH_BITS = 64
+
+
+def canonical_url(url: str) -> str:
+    """Lowercase scheme/host, drop tracking params, fragment and trailing slash."""
+    parts = urlsplit((url or "").strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k)])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), query, ""))
+
+
+def article_text(article: Dict) -> str:
+    text = " ".join(article.get(field) or "" for field in ("title", "description", "content"))
+    text = _TRUNCATION_MARKER.sub(" ", text.lower())
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """64-bit SimHash over word shingles; near-identical texts differ in only a few bits."""
+    words = text.split()
+    shingles = [" ".join(words[i:i + shingle]) for i in range(max(len(words) - shingle + 1, 1))]
+    weights = [0] * SIMHASH_BITS
+    for piece in shingles:
+        value = int.from_bytes(hashlib.blake2b(piece.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class ArticleStore:
+    """
+    SQLite-backed store of scored articles, so each story is sent to the LLM once.
+
+    Articles are remembered per company (relevance depends on the company asked
+    about) under their canonical URL, exact content hash and SimHash fingerprint.
+    An incoming article reuses a stored score when any of the three matches, the
+    fingerprint within ``max_distance`` bits, which catches syndicated copies
+    published under different URLs.
+
+    Args:
+        path: SQLite database file (":memory:" works for tests)
+        ttl: Seconds a scored article is remembered
+        max_distance: Largest SimHash Hamming distance treated as the same story
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "articles.sqlite"),
+        ttl: float = 7 * DAY,
+        max_distance: int = 6,
+    ):
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.stats = {"hits": 0, "near_duplicates": 0, "new": 0}
+
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "company TEXT NOT NULL, url TEXT NOT NULL, content_hash TEXT NOT NULL, simhash INTEGER NOT NULL, "
+            "relevance_score REAL NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (company, url))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_hash ON articles (company, content_hash)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(article: Dict) -> Tuple[str, str, int]:
+        text = article_text(article)
+        return (
+            canonical_url(article.get("url", "")),
+            hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            simhash(text),
+        )
+
+    def _stored(self, company: str) -> List[Tuple[str, str, int, float]]:
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            return self._conn.execute(
+                "SELECT url, content_hash, simhash, relevance_score FROM articles "
+                "WHERE company = ? AND stored_at >= ?", (company, cutoff)
+            ).fetchall()
+
+    def _match(self, fingerprint: Tuple[str, str, int], candidates) -> Optional[Tuple[object, bool]]:
+        """(value, exact) of the first candidate (url, hash, simhash, value) matching the fingerprint."""
+        url, digest, fingerprint_hash = fingerprint
+        for other_url, other_digest, _, value in candidates:
+            if (url and url == other_url) or digest == other_digest:
+                return value, True
+        for _, _, other_hash, value in candidates:
+            if ((fingerprint_hash ^ other_hash) & ((1 << 64) - 1)).bit_count() <= self.max_distance:
+                return value, False
+        return None
+
+    def partition(self, company: str, articles: List[Dict]) -> Tuple[List[Dict], List[Dict], Dict[int, int]]:
+        """
+        Split articles into already-scored, new and duplicate-of-new.
+
+        Known articles get their stored ``relevance_score`` filled in. Among the new
+        ones, later near-duplicates of an earlier article are not returned for scoring.
+
+        Returns:
+            Tuple: (known articles, new articles to score, {duplicate index: index of its
+                original in ``articles``} for copies of new articles)
+        """
+        stored = self._stored(company)
+        known, new, copies = [], [], {}
+        seen: List[Tuple[str, str, int, int]] = []
+        for index, article in enumerate(articles):
+            fingerprint = self.fingerprint(article)
+            match = self._match(fingerprint, stored)
+            if match is not None:
+                article["relevance_score"] = match[0]
+                self.stats["hits" if match[1] else "near_duplicates"] += 1
+                known.append(article)
+                continue
+            original = self._match(fingerprint, seen)
+            if original is not None:
+                self.stats["near_duplicates"] += 1
+                copies[index] = original[0]
+                continue
+            self.stats["new"] += 1
+            seen.append((*fingerprint, index))
+            new.append(article)
+        return known, new, copies
+
+    def save(self, company: str, articles: List[Dict]) -> None:
+        """Remember scored articles (those returned by partition) for ``company``."""
+        now = time.time()
+        rows = []
+        for article in articles:
+            url, digest, fingerprint_hash = self.fingerprint(article)
+            rows.append((company, url or digest, digest, _to_signed(fingerprint_hash), article["relevance_score"], now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO articles (company, url, content_hash, simhash, relevance_score, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows,
+            )
+            self._conn.execute("DELETE FROM articles WHERE stored_at < ?", (now - self.ttl,))
+            self._conn.commit()
@@ -0,0 +1,46 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so import costs are measured cold
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import app
+timings = {"import": time.perf_counter() - start}
+
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+with TestClient(app.app) as client:
+    timings["startup"] = time.perf_counter() - start
+    for name, path in [("health", "/health"), ("first_request", "/prices/AAPL"), ("second_request", "/prices/AAPL")]:
+        start = time.perf_counter()
+        client.get(path)
+        timings[name] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def measure(runs: int = 5, warmup: bool = False) -> dict:
+    """Median seconds for import, app startup and the first/second requests over several cold starts."""
+    env = dict(os.environ, WARMUP_ON_STARTUP="1" if warmup else "0")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+if __name__ == "__main__":
+    for warmup in (False, True):
+        timings = measure(warmup=warmup)
+        print(f"WARMUP_ON_STARTUP={int(warmup)}: " + ", ".join(f"{key} {value * 1000:.0f} ms" for key, value in timings.items()))
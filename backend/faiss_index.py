@@ -0,0 +1,479 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = "stock_index.faiss"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+METADATA_COLUMNS = {
+    "Symbol": "symbol",
+    "Date": "date",
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Close": "close",
+    "Volume": "volume",
+    "Dividends": "dividends",
+    "Stock Splits": "stock_splits",
+}
+
+
+def build_text_column(df: pd.DataFrame) -> pd.Series:
+    """Text representation of every row, built column-wise: "SYMBOL open high low close volume"."""
+    text = df["Symbol"].astype(str)
+    for column in ["Open", "High", "Low", "Close", "Volume"]:
+        text = text + " " + df[column].astype(str)
+    return text
+
+
+def bar_dates(dates: pd.Series) -> pd.Series:
+    """ISO date of each bar, ignoring any time/timezone suffix."""
+    return dates.astype(str).str[:10]
+
+
+def vector_ids(symbols: pd.Series, dates: pd.Series) -> np.ndarray:
+    """
+    Stable 63-bit ids derived from (symbol, date), so the same bar always maps to the same vector.
+    """
+    keys = symbols.astype(str) + "|" + bar_dates(dates)
+    return np.array(
+        [
+            int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big") & 0x7FFFFFFFFFFFFFFF
+            for key in keys
+        ],
+        dtype=np.int64,
+    )
+
+
+def metadata_path_for(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + "_meta.sqlite"
+
+
+def params_path_for(index_path: str) -> str:
+    return os.path.splitext(index_path)[0] + "_params.json"
+
+
+# Index kinds and their default parameters; nlist=None picks sqrt(training set size)
+INDEX_KINDS = {
+    "flat": {},
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "hnsw": {"m": 32, "ef_construction": 80, "ef_search": 64},
+    "ivf_pq": {"nlist": None, "nprobe": 8, "pq_m": 16, "nbits": 8},
+}
+# FAISS warns (and clusters poorly) below this many training points per k-means centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def index_params(kind: str, overrides: Optional[Dict] = None) -> Dict:
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}', expected one of {sorted(INDEX_KINDS)}")
+    params = {"kind": kind, **INDEX_KINDS[kind]}
+    params.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    return params
+
+
+def make_index(dimension: int, params: Dict, training_size: int = 0) -> faiss.Index:
+    """
+    Build an empty id-mapped index of the requested kind.
+
+    Args:
+        dimension: Embedding dimension
+        params: Output of index_params(); a chosen nlist is written back into it
+        training_size: Number of vectors available for training, used to size nlist
+    """
+    kind = params["kind"]
+    if kind in ("ivf_flat", "ivf_pq") and params.get("nlist") is None:
+        params["nlist"] = max(1, int(np.sqrt(max(training_size, 1))))
+    if training_size and kind in ("ivf_flat", "ivf_pq"):
+        # k-means wants MIN_POINTS_PER_CENTROID training points per centroid, for the coarse
+        # quantizer and for each PQ codebook (2**nbits centroids); shrink both to fit small samples
+        most = max(1, training_size // MIN_POINTS_PER_CENTROID)
+        capped = {"nlist": min(params["nlist"], most)}
+        if kind == "ivf_pq":
+            capped["nbits"] = min(params["nbits"], max(1, int(np.log2(most))))
+        if any(params[key] != value for key, value in capped.items()):
+            logger.info(f"Reduced {kind} parameters to {capped} for {training_size} training vectors")
+        params.update(capped)
+
+    if kind == "flat":
+        base = faiss.IndexFlatL2(dimension)
+    elif kind == "ivf_flat":
+        base = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, params["nlist"])
+    elif kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, params["m"])
+        base.hnsw.efConstruction = params["ef_construction"]
+    else:
+        base = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, params["nlist"], params["pq_m"], params["nbits"])
+
+    index = faiss.IndexIDMap2(base)
+    apply_search_params(index, params)
+    return index
+
+
+def apply_search_params(index: faiss.Index, params: Dict) -> None:
+    """Set query-time knobs (nprobe / efSearch), which are not always restored from the index file."""
+    space = faiss.ParameterSpace()
+    if "nprobe" in params:
+        space.set_index_parameter(index, "nprobe", params["nprobe"])
+    if "ef_search" in params:
+        space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+
+def search_params(params: Dict, ids: np.ndarray) -> faiss.SearchParameters:
+    """Per-query search parameters restricting results to the given ids."""
+    selector = faiss.IDSelectorBatch(ids)
+    if params["kind"] in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=params["nprobe"])
+    if params["kind"] == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=params["ef_search"])
+    return faiss.SearchParameters(sel=selector)
+
+
+class StockIndexBuilder:
+    """
+    Maintains a FAISS index of bar embeddings with stable ids and a SQLite metadata sidecar.
+
+    Vectors are stored under ids from vector_ids(), and every id has a metadata row
+    (symbol, date, OHLCV) in ``<index>_meta.sqlite``, so search hits can be mapped
+    back to bars and ranges can be appended or deleted without a rebuild.
+
+    IVF and PQ indexes are trained on a sample of the first batch appended; HNSW
+    indexes do not support delete_range().
+
+    Args:
+        dimension: Embedding dimension
+        index_path: FAISS index file, replaced atomically on save()
+        metadata_path: SQLite sidecar (defaults to <index>_meta.sqlite)
+        kind: Index kind for a new index (see INDEX_KINDS); an existing index keeps
+            the kind and parameters stored in <index>_params.json
+        params: Overrides for the kind's default parameters
+        train_sample: Maximum number of vectors used to train IVF/PQ indexes
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        index_path: str = INDEX_PATH,
+        metadata_path: Optional[str] = None,
+        kind: str = "flat",
+        params: Optional[Dict] = None,
+        train_sample: int = 50000,
+    ):
+        self.dimension = dimension
+        self.index_path = index_path
+        self.metadata_path = metadata_path or metadata_path_for(index_path)
+        self.params = index_params(kind, params)
+        self.train_sample = train_sample
+        self.index = self._load_index()
+
+        self.conn = sqlite3.connect(self.metadata_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bars ("
+            "id INTEGER PRIMARY KEY, symbol TEXT NOT NULL, date TEXT NOT NULL, "
+            "open REAL, high REAL, low REAL, close REAL, volume INTEGER, dividends REAL, stock_splits REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bars_symbol_date ON bars (symbol, date)")
+        self.conn.commit()
+
+        if (self.index.ntotal if self.index is not None else 0) != self._count():
+            logger.warning(
+                f"Index has {self.index.ntotal if self.index is not None else 0} vectors but metadata has {self._count()} rows; rebuild recommended"
+            )
+
+    def _load_index(self) -> Optional[faiss.Index]:
+        """Load the stored index, or return None so append() creates one sized to its first batch."""
+        if os.path.exists(self.index_path):
+            index = faiss.read_index(self.index_path)
+            if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) and index.d == self.dimension:
+                params_path = params_path_for(self.index_path)
+                if os.path.exists(params_path):
+                    with open(params_path, "r", encoding="utf-8") as f:
+                        self.params = json.load(f)
+                apply_search_params(index, self.params)
+                logger.info(f"Loaded {self.params['kind']} FAISS index with {index.ntotal} vectors")
+                return index
+            logger.warning(f"{self.index_path} has no id mapping or a different dimension; starting a new index")
+        return None
+
+    def _ensure_index(self, vectors: np.ndarray) -> None:
+        if self.index is None:
+            self.index = make_index(self.dimension, self.params, training_size=min(len(vectors), self.train_sample))
+        if not self.index.is_trained:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.permutation(len(vectors))[:self.train_sample]]
+            logger.info(f"Training {self.params['kind']} index on {len(sample)} vectors")
+            self.index.train(sample)
+
+    def _check_removable(self) -> None:
+        if self.params["kind"] == "hnsw":
+            raise ValueError("HNSW indexes cannot remove vectors; rebuild the index instead")
+
+    def _count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM bars").fetchone()[0]
+
+    def existing_ids(self, ids: np.ndarray) -> set:
+        found = set()
+        for start in range(0, len(ids), 500):
+            chunk = [int(i) for i in ids[start:start + 500]]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                row[0] for row in self.conn.execute(f"SELECT id FROM bars WHERE id IN ({placeholders})", chunk)
+            )
+        return found
+
+    def append(self, data: pd.DataFrame, vectors: np.ndarray, replace: bool = False) -> int:
+        """
+        Add bars and their vectors to the index.
+
+        Args:
+            data: Bars with Symbol, Date and OHLCV columns, row-aligned with vectors
+            vectors: Embedding matrix
+            replace: Re-insert bars that are already indexed (e.g. a revised partial week)
+                instead of skipping them; raises ValueError on HNSW indexes when any are indexed
+
+        Returns:
+            int: Number of vectors added
+        """
+        ids = vector_ids(data["Symbol"], data["Date"])
+        existing = np.fromiter(self.existing_ids(ids), dtype=np.int64)
+        self._ensure_index(np.ascontiguousarray(vectors, dtype=np.float32))
+        if replace:
+            if len(existing):
+                self._check_removable()
+                self.index.remove_ids(existing)
+            keep = np.ones(len(ids), dtype=bool)
+        else:
+            keep = ~np.isin(ids, existing)
+        if not keep.any():
+            return 0
+
+        new_vectors = np.ascontiguousarray(vectors[keep], dtype=np.float32)
+        self.index.add_with_ids(new_vectors, ids[keep])
+
+        rows = data.loc[keep, list(METADATA_COLUMNS)].rename(columns=METADATA_COLUMNS)
+        rows["date"] = bar_dates(rows["date"])
+        rows.insert(0, "id", ids[keep])
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO bars ({', '.join(rows.columns)}) VALUES ({', '.join('?' * len(rows.columns))})",
+            rows.astype(object).itertuples(index=False, name=None),
+        )
+        logger.info(f"Added {int(keep.sum())} vectors to FAISS")
+        return int(keep.sum())
+
+    def delete_range(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> int:
+        """
+        Remove one symbol's bars between two ISO dates (inclusive, open-ended if omitted).
+
+        Returns:
+            int: Number of vectors removed
+        """
+        ids = np.array(
+            [
+                row[0]
+                for row in self.conn.execute(
+                    "SELECT id FROM bars WHERE symbol = ? AND date >= ? AND date <= ?",
+                    (symbol, start or "", end or "9999-12-31"),
+                )
+            ],
+            dtype=np.int64,
+        )
+        if len(ids) == 0:
+            return 0
+        self._check_removable()
+        removed = self.index.remove_ids(ids)
+        self.conn.executemany("DELETE FROM bars WHERE id = ?", [(int(i),) for i in ids])
+        logger.info(f"Removed {removed} vectors for {symbol}")
+        return removed
+
+    def save(self) -> None:
+        """Commit metadata and atomically replace the index and parameter files."""
+        tmp_path = f"{self.index_path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        params_path = params_path_for(self.index_path)
+        with open(f"{params_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.params, f, indent=2)
+        self.conn.commit()
+        os.replace(f"{params_path}.tmp", params_path)
+        os.replace(tmp_path, self.index_path)
+        logger.info(f"FAISS index saved to {self.index_path}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class StockIndexSearcher:
+    """
+    Read-only, filtered search over an index written by StockIndexBuilder.
+
+    Args:
+        index_path: FAISS index file with an id mapping and a metadata sidecar
+    """
+
+    def __init__(self, index_path: str = INDEX_PATH):
+        self.index = faiss.read_index(index_path)
+        if not isinstance(self.index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            raise ValueError(f"{index_path} has no id mapping; rebuild it with StockIndexBuilder")
+        self.params = {"kind": "flat"}
+        params_path = params_path_for(index_path)
+        if os.path.exists(params_path):
+            with open(params_path, "r", encoding="utf-8") as f:
+                self.params = json.load(f)
+        apply_search_params(self.index, self.params)
+        self.conn = sqlite3.connect(metadata_path_for(index_path), check_same_thread=False)
+
+    def ids_for(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> np.ndarray:
+        rows = self.conn.execute(
+            "SELECT id FROM bars WHERE symbol = ? AND date >= ? AND date <= ?",
+            (symbol, start or "", end or "9999-12-31"),
+        ).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    def rows(self, ids) -> pd.DataFrame:
+        """Metadata rows for the given ids, in the same order."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return pd.DataFrame(columns=["id", *METADATA_COLUMNS.values()])
+        placeholders = ",".join("?" * len(ids))
+        frame = pd.read_sql_query(f"SELECT * FROM bars WHERE id IN ({placeholders})", self.conn, params=ids)
+        present = set(frame["id"])
+        return frame.set_index("id").loc[[i for i in ids if i in present]].reset_index()
+
+    def _search(self, queries: np.ndarray, ids: np.ndarray, k: int):
+        distances, hits = self.index.search(
+            np.ascontiguousarray(queries, dtype=np.float32), k, params=search_params(self.params, ids)
+        )
+        return distances, hits
+
+    def search(
+        self,
+        queries: np.ndarray,
+        symbols: list,
+        k: int = 5,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> list:
+        """
+        Top-k bars per query, restricted to the query's symbol and an optional date window.
+
+        All queries go through one index search filtered to the union of their symbols'
+        bars; a symbol that gets fewer than k hits from the shared search is re-searched alone.
+
+        Args:
+            queries: One query vector per symbol
+            symbols: Symbol each query is restricted to
+            k: Hits per query
+            start: First ISO date to include
+            end: Last ISO date to include
+
+        Returns:
+            list: One DataFrame of metadata rows (plus a distance column) per query
+        """
+        allowed = {symbol: self.ids_for(symbol, start, end) for symbol in set(symbols)}
+        union = np.concatenate(list(allowed.values())) if allowed else np.empty(0, dtype=np.int64)
+        if len(union) == 0:
+            return [self.rows([]) for _ in symbols]
+
+        distances, hits = self._search(queries, union, min(len(union), k * len(allowed)))
+        results = []
+        for i, symbol in enumerate(symbols):
+            mask = np.isin(hits[i], allowed[symbol])
+            found, dist = hits[i][mask][:k], distances[i][mask][:k]
+            if len(found) < min(k, len(allowed[symbol])):
+                dist, found = self._search(queries[i:i + 1], allowed[symbol], k)
+                dist, found = dist[0][found[0] >= 0], found[0][found[0] >= 0]
+            frame = self.rows(found)
+            frame["distance"] = dist[:len(frame)]
+            results.append(frame)
+        return results
+
+
+def stored_vectors(index_path: str = INDEX_PATH) -> np.ndarray:
+    """All vectors held by an existing flat index (id-mapped or legacy), in insertion order."""
+    index = faiss.read_index(index_path)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    if not isinstance(index, faiss.IndexFlat):
+        raise ValueError(f"{index_path} is not a flat index; its vectors cannot be recovered exactly")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def benchmark(vectors: np.ndarray, kinds, k: int = 10, n_queries: int = 200) -> list:
+    """
+    Compare index kinds against exact Flat search on the same vectors.
+
+    Queries are stored vectors with small Gaussian noise, searched one at a time.
+
+    Returns:
+        list: One dict per kind with recall@k, p50/p99 query latency (ms), memory (bytes) and build time (s)
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    picks = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=1e-3, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for kind in kinds:
+        params = index_params(kind)
+        start = time.perf_counter()
+        index = make_index(vectors.shape[1], params, training_size=len(vectors))
+        if not index.is_trained:
+            index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        build_s = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty_like(truth)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, hits = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = hits[0]
+
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        results.append({
+            "kind": kind,
+            "recall": float(recall),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "memory_bytes": int(faiss.serialize_index(index).nbytes),
+            "build_s": build_s,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index kinds against exact search")
+    parser.add_argument("--embeddings", default="../embeddings.npy", help=".npy file written by rag_embeddings.py")
+    parser.add_argument("--index", default=INDEX_PATH, help="Flat index to read the vectors from when --embeddings is missing")
+    parser.add_argument("--kinds", nargs="+", default=list(INDEX_KINDS), choices=list(INDEX_KINDS))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if os.path.exists(args.embeddings):
+        embeddings = np.load(args.embeddings, mmap_mode="r")
+    else:
+        print(f"{args.embeddings} not found, using the vectors stored in {args.index}")
+        embeddings = stored_vectors(args.index)
+    print(f"{len(embeddings)} vectors, dimension {embeddings.shape[1]}")
+    print(f"{'kind':<10}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p99 ms':>10}{'memory MB':>12}{'build s':>10}")
+    for row in benchmark(embeddings, args.kinds, k=args.k, n_queries=args.queries):
+        print(
+            f"{row['kind']:<10}{row['recall']:>10.3f}{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}"
+            f"{row['memory_bytes'] / 1e6:>12.2f}{row['build_s']:>10.2f}"
+        )
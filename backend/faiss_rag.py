@@ -1,12 +1,17 @@
 import pandas as pd
 import numpy as np
-import faiss
 from datetime import datetime
 from groq import Groq
 import os
-from typing import Dict, Tuple, List
+from typing import Dict, Iterator, Tuple, List
 import logging
 import dotenv
+from price_store import PriceStore
+from rollups import RollupEngine
+from indicators import IndicatorEngine
+from faiss_index import EMBEDDING_MODEL, StockIndexSearcher, bar_dates, build_text_column
+from lazy import LazyResource
+from llm_cache import LLMCache
 
 
 
@@ -21,78 +26,174 @@ import dotenv
 dotenv.load_dotenv()
 GROQ_API_KEY = os.getenv("GROQ_TOKEN")
 PATH = "../Data/stock_data.csv"
+PRICES_DIR = "../Data/prices"  # Parquet dataset (Symbol=/Year= partitions), preferred over PATH when present
+MODEL = "llama-3.1-8b-instant"
+TEMPERATURE = 0.45
+# Pin cached completions to the symbol's data version instead of expiring them by TTL
+PIN_LLM_CACHE_TO_DATA = os.getenv("PIN_LLM_CACHE_TO_DATA", "1") == "1"
 # print(GROQ_API_KEY)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class StockAnalysisRAG:
     def __init__(self, faiss_index_path: str):
-        self.index = faiss.read_index(faiss_index_path)
-        self.client = Groq(api_key=GROQ_API_KEY)
-        self.data = pd.read_csv(PATH)  # Load your original data
+        # Heavy resources are built on first use so constructing the analyzer is instant
+        self._searcher = LazyResource(lambda: self._load_searcher(faiss_index_path))
+        self._encoder = LazyResource(self._load_encoder)
+        self._client = LazyResource(lambda: Groq(api_key=GROQ_API_KEY))
+        self._prices = LazyResource(self._load_prices)  # Dates parsed once, partitioned by symbol
+        self._rollups = LazyResource(lambda: RollupEngine(self.prices))  # Monthly/quarterly averages for every symbol
+        self._indicators = LazyResource(lambda: IndicatorEngine(self.prices))  # Technical indicators for every symbol
+        self._llm_cache = LazyResource(LLMCache)
+
+    @property
+    def searcher(self):
+        return self._searcher.get()
+
+    @property
+    def encoder(self):
+        """SentenceTransformer used for query embeddings, loaded on first retrieval."""
+        return self._encoder.get()
+
+    @property
+    def client(self) -> Groq:
+        return self._client.get()
+
+    @property
+    def prices(self) -> PriceStore:
+        return self._prices.get()
+
+    @property
+    def rollups(self) -> RollupEngine:
+        return self._rollups.get()
+
+    @property
+    def indicators(self) -> IndicatorEngine:
+        return self._indicators.get()
+
+    @property
+    def llm_cache(self) -> LLMCache:
+        return self._llm_cache.get()
+
+    def cache_version(self, symbol: str) -> str:
+        return self.prices.data_version(symbol) if PIN_LLM_CACHE_TO_DATA else None
+
+    def warm_up(self, include_encoder: bool = False) -> None:
+        """Load everything a request needs up front (the encoder only on request, it is the slowest)."""
+        self.rollups
+        self.indicators
+        self.searcher
+        self.client
+        if include_encoder:
+            self.encoder
 
     def get_monthly_averages(self, symbol: str) -> pd.DataFrame:
-        # Filter data for symbol
-        stock_data = self.data[self.data['Symbol'] == symbol].copy()
-        stock_data['Date'] = pd.to_datetime(stock_data['Date'])
-        
-        # Calculate monthly averages
-        monthly_avg = stock_data.groupby(
-            [stock_data['Date'].dt.year.rename('Year'), 
-             stock_data['Date'].dt.month.rename('Month')]
-        ).agg({
-            'Open': 'mean',
-            'High': 'mean',
-            'Low': 'mean',
-            'Close': 'mean',
-            'Volume': 'mean'
-        })
-        
-        # Convert index to proper datetime
-        monthly_avg = monthly_avg.reset_index()
-        monthly_avg['Date'] = pd.to_datetime(
-            monthly_avg['Year'].astype(str) + '-' + 
-            monthly_avg['Month'].astype(str) + '-01'
-        )
-        
-        return monthly_avg[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+        return self.rollups.get(symbol, "monthly")
     
     def get_quarterly_averages(self, symbol: str) -> pd.DataFrame:
-        # Filter data for symbol
-        stock_data = self.data[self.data['Symbol'] == symbol].copy()
-        stock_data['Date'] = pd.to_datetime(stock_data['Date'])
-        
-        # Calculate quarterly averages
-        quarterly_avg = stock_data.groupby(
-            [stock_data['Date'].dt.year.rename('Year'), 
-             stock_data['Date'].dt.quarter.rename('Quarter')]
-        ).agg({
-            'Open': lambda x: round(x.mean(), 2),
-            'High': lambda x: round(x.mean(), 2),
-            'Low': lambda x: round(x.mean(), 2),
-            'Close': lambda x: round(x.mean(), 2),
-            'Volume': lambda x: round(x.mean(), 2)
-        })
-        
-        # Convert index to proper datetime using quarter start dates
-        quarterly_avg = quarterly_avg.reset_index()
-        quarterly_avg['Month'] = quarterly_avg['Quarter'].map({1: '01', 2: '04', 3: '07', 4: '10'})
-        quarterly_avg['Date'] = pd.to_datetime(
-            quarterly_avg['Year'].astype(str) + '-' + 
-            quarterly_avg['Month'] + '-01'
-        )
-        
-        return quarterly_avg[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']]
+        return self.rollups.get(symbol, "quarterly")
+
+    def add_bars(self, bars: pd.DataFrame) -> None:
+        """Store new weekly bars (e.g. the output of PostData.get_data) and update only the affected rollups and indicators."""
+        stored = self.prices.upsert(bars)
+        self.rollups.update(stored)
+        self.indicators.update(stored)
+
+    def _load_prices(self) -> PriceStore:
+        if os.path.isdir(PRICES_DIR):
+            return PriceStore.from_parquet(PRICES_DIR)
+        return PriceStore.from_csv(PATH)
+
+    def _load_searcher(self, faiss_index_path: str):
+        try:
+            return StockIndexSearcher(faiss_index_path)
+        except ValueError as e:
+            logger.warning(f"Retrieval disabled: {e}")
+            return None
+
+    def _load_encoder(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL)
+
+    def retrieve_context_batch(self, symbols: List[str], k: int = 5,
+                               start: str = None, end: str = None) -> List[pd.DataFrame]:
+        """
+        Find the k stored weeks most similar to each symbol's latest bar, in one batched search.
+
+        The latest bar itself is indexed too and would always be the top hit, repeating
+        the prompt's "Latest price" line, so the query's own week is left out.
+
+        Args:
+            symbols: Symbols to retrieve context for
+            k: Number of bars per symbol
+            start: First ISO date to search (inclusive)
+            end: Last ISO date to search (inclusive)
+
+        Returns:
+            List[pd.DataFrame]: Matching bars with a distance column, one frame per symbol
+        """
+        if self.searcher is None:
+            return [pd.DataFrame() for _ in symbols]
+
+        latest = pd.concat([self.prices.frame(symbol).tail(1) for symbol in symbols], ignore_index=True)
+        known = [symbol for symbol in symbols if symbol in set(latest["Symbol"])]
+        if not known:
+            return [pd.DataFrame() for _ in symbols]
 
-    def analyze_stock(self, symbol: str, price_data: pd.DataFrame) -> str:
-        """Generate stock analysis using ChatGroq"""
-        prompt = f"""
+        queries = self.encoder.encode(build_text_column(latest).tolist(), convert_to_numpy=True)
+        query_dates = dict(zip(latest["Symbol"], bar_dates(latest["Date"])))
+        found = {}
+        for symbol, hits in zip(known, self.searcher.search(queries, known, k=k + 1, start=start, end=end)):
+            found[symbol] = hits[hits["date"] != query_dates[symbol]].head(k).reset_index(drop=True)
+        return [found.get(symbol, pd.DataFrame()) for symbol in symbols]
+
+    def retrieve_context(self, symbol: str, k: int = 5, start: str = None, end: str = None) -> pd.DataFrame:
+        return self.retrieve_context_batch([symbol], k=k, start=start, end=end)[0]
+
+    def try_retrieve_context(self, symbol: str) -> pd.DataFrame:
+        """Retrieval is best-effort: analysis still runs without context if it fails"""
+        try:
+            return self.retrieve_context(symbol)
+        except Exception as e:
+            logger.warning(f"Context retrieval failed for {symbol}: {str(e)}")
+            return None
+
+    def format_context(self, context: pd.DataFrame) -> str:
+        if context is None or context.empty:
+            return ""
+        lines = [
+            f"- {row.date}: open ${row.open:.2f}, high ${row.high:.2f}, low ${row.low:.2f}, "
+            f"close ${row.close:.2f}, volume {row.volume:.0f}"
+            for row in context.sort_values("date").itertuples()
+        ]
+        return "Most similar past weeks:\n" + "\n".join(lines)
+
+    def format_indicators(self, symbol: str) -> str:
+        latest = self.indicators.latest(symbol)
+        if not latest:
+            return ""
+
+        def value(name: str, fmt: str) -> str:
+            return "n/a" if np.isnan(latest[name]) else format(latest[name], fmt)
+
+        return f"""
+        Technical indicators (weekly bars):
+        SMA 10/20: ${value('sma_10', '.2f')} / ${value('sma_20', '.2f')}, EMA 12/26: ${value('ema_12', '.2f')} / ${value('ema_26', '.2f')}
+        RSI(14): {value('rsi_14', '.1f')}, ATR(14): ${value('atr_14', '.2f')}
+        Bollinger bands (20, 2σ): ${value('bb_lower', '.2f')} - ${value('bb_upper', '.2f')}
+        Realized volatility (13w, annualized): {value('realized_vol_13', '.1%')}, drawdown from peak: {value('drawdown', '.1%')}
+        """
+
+    def build_analysis_prompt(self, symbol: str, price_data: pd.DataFrame, context: pd.DataFrame = None) -> str:
+        return f"""
         You are an Expert Financial Analyst.
         Analyze the following stock data for {symbol}:
         
         Latest price: ${price_data['Close'].iloc[-1]:.2f}
         Average volume: {price_data['Volume'].mean():.0f}
         Price range: ${price_data['Low'].min():.2f} - ${price_data['High'].max():.2f}
+        {self.format_indicators(symbol)}
+        {self.format_context(context)}
         
         Please provide an Finaancial Narrative covering:
         1. Overall stock performance and behavior
@@ -102,33 +203,70 @@ class StockAnalysisRAG:
         Limit the response to 100 words.
         """
 
+    def build_narrative_prompt(self, analysis: str) -> str:
+        return f"""
+                 Write a financial narrative based on this summary:
+                {analysis}
+                Limit the narrative to 1000 words. 
+            """
+
+    def complete(self, prompt: str, version: str = None) -> str:
+        """Blocking completion, served from the LLM cache when the same prompt was answered before"""
+        key = self.llm_cache.key(MODEL, TEMPERATURE, prompt, version)
+        cached = self.llm_cache.get(key)
+        if cached is not None:
+            return cached
+
         response = self.client.chat.completions.create(
             messages=[{
                 "role": "user",
                 "content": prompt
             }],
-            model="llama-3.1-8b-instant",
-            temperature=0.45,
+            model=MODEL,
+            temperature=TEMPERATURE,
         )
-        
-        return response.choices[0].message.content
+        content = response.choices[0].message.content
+        self.llm_cache.set(key, content, response.usage.total_tokens, pinned=version is not None)
+        return content
+
+    def stream(self, prompt: str, version: str = None) -> Iterator[str]:
+        """Yield completion tokens as Groq produces them (a cached answer arrives as one chunk)"""
+        key = self.llm_cache.key(MODEL, TEMPERATURE, prompt, version)
+        cached = self.llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
 
-    def get_narrative(self, analysis: str):
-        prompt = f"""
-                 Write a financial narrative based on this summary:
-                {analysis}
-                Limit the narrative to 1000 words. 
-            """
         response = self.client.chat.completions.create(
             messages=[{
                 "role": "user",
                 "content": prompt
             }],
-            model="llama-3.1-8b-instant",
-            temperature=0.45,
+            model=MODEL,
+            temperature=TEMPERATURE,
+            stream=True,
         )
+        tokens = []
+        usage = None
+        for chunk in response:
+            # Groq reports usage on the final chunk
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                tokens.append(token)
+                yield token
+
+        content = "".join(tokens)
+        total_tokens = usage.total_tokens if usage is not None else len(content) // 4
+        self.llm_cache.set(key, content, total_tokens, pinned=version is not None)
+
+    def analyze_stock(self, symbol: str, price_data: pd.DataFrame, context: pd.DataFrame = None) -> str:
+        """Generate stock analysis using ChatGroq, grounded in retrieved similar weeks when available"""
+        return self.complete(self.build_analysis_prompt(symbol, price_data, context), self.cache_version(symbol))
+
+    def get_narrative(self, analysis: str, version: str = None):
+        return self.complete(self.build_narrative_prompt(analysis), version)
 
-        return response.choices[0].message.content
     def save_llm_output(self, content: str, prefix: str = "llm_output") -> str:
         """
         Save LLM output to a text file with timestamp
@@ -164,11 +302,33 @@ class StockAnalysisRAG:
         """Main function to get stock analysis and price data"""
         try:
             quarterly_prices = self.get_quarterly_averages(symbol)
-            analysis = self.analyze_stock(symbol, quarterly_prices)
-            narrative = self.get_narrative(analysis)
+            context = self.try_retrieve_context(symbol)
+            analysis = self.analyze_stock(symbol, quarterly_prices, context)
+            narrative = self.get_narrative(analysis, self.cache_version(symbol))
             # output_file = self.save_llm_output(narrative)
             return quarterly_prices, analysis, narrative
             
         except Exception as e:
             logger.error(f"Error analyzing stock {symbol}: {str(e)}")
             raise
+
+    def stream_stock_insights(self, symbol: str) -> Iterator[Tuple[str, object]]:
+        """
+        Streaming variant of get_stock_insights.
+
+        Yields (event, data) pairs: ("prices", quarterly DataFrame) immediately, then
+        ("analysis", token) while the analysis is generated, then ("narrative", token)
+        for the narrative built from the finished analysis.
+        """
+        quarterly_prices = self.get_quarterly_averages(symbol)
+        yield "prices", quarterly_prices
+
+        context = self.try_retrieve_context(symbol)
+        version = self.cache_version(symbol)
+        analysis_tokens = []
+        for token in self.stream(self.build_analysis_prompt(symbol, quarterly_prices, context), version):
+            analysis_tokens.append(token)
+            yield "analysis", token
+
+        for token in self.stream(self.build_narrative_prompt("".join(analysis_tokens)), version):
+            yield "narrative", token
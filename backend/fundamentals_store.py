@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from storage import CACHE_DIR, DAY, connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class FundamentalsStore:
+    """
+    SQLite-backed cache of annual financial statements, keyed by ticker.
+
+    Entries are fresh while they sit in the same time bucket (``fresh_for`` seconds,
+    aligned to the epoch) as the current time, so every worker agrees on when data
+    turns stale. Stale entries younger than ``max_age`` are served immediately and
+    refreshed in the background; older or missing entries are fetched inline.
+    Concurrent requests for the same ticker share a single upstream fetch.
+
+    Args:
+        fetcher: Callable returning the financial data dict for a ticker
+        path: SQLite database file (":memory:" works for benchmarks)
+        fresh_for: Bucket width in seconds
+        max_age: Oldest entry that may still be served while refreshing
+        background_refresh: Serve stale entries and refresh them off the request path
+        max_workers: Threads used for background refreshes
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[str], Dict],
+        path: str = os.path.join(CACHE_DIR, "fundamentals.sqlite"),
+        fresh_for: float = DAY,
+        max_age: float = 90 * DAY,
+        background_refresh: bool = True,
+        max_workers: int = 4,
+    ):
+        self.fetcher = fetcher
+        self.fresh_for = fresh_for
+        self.max_age = max_age
+        self.background_refresh = background_refresh
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0}
+
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fundamentals ("
+            "ticker TEXT PRIMARY KEY, payload TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fundamentals")
+
+    def _read(self, ticker: str):
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT payload, fetched_at FROM fundamentals WHERE ticker = ?", (ticker,)
+            ).fetchone()
+
+    def _write(self, ticker: str, payload: Dict) -> None:
+        with self._db_lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fundamentals (ticker, payload, fetched_at) VALUES (?, ?, ?)",
+                (ticker, json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+
+    def _is_fresh(self, fetched_at: float, now: float) -> bool:
+        return int(fetched_at // self.fresh_for) == int(now // self.fresh_for)
+
+    def _fetch(self, ticker: str, background: bool) -> Future:
+        """Start (or join) the upstream fetch for a ticker; only the first caller runs it."""
+        with self._inflight_lock:
+            future = self._inflight.get(ticker)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[ticker] = future
+            self.stats["fetches"] += 1
+
+        def run():
+            try:
+                payload = self.fetcher(ticker)
+                self._write(ticker, payload)
+                future.set_result(payload)
+            except Exception as e:
+                logger.error(f"Error fetching fundamentals for {ticker}: {e}")
+                future.set_exception(e)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(ticker, None)
+
+        if background:
+            self._executor.submit(run)
+        else:
+            run()
+        return future
+
+    def get(self, ticker: str) -> Dict:
+        ticker = ticker.upper()
+        row = self._read(ticker)
+        now = time.time()
+        if row is not None:
+            payload, fetched_at = row
+            if self._is_fresh(fetched_at, now):
+                self.stats["hits"] += 1
+                return json.loads(payload)
+            if self.background_refresh and now - fetched_at <= self.max_age:
+                self.stats["stale_hits"] += 1
+                self._fetch(ticker, background=True)
+                return json.loads(payload)
+
+        self.stats["misses"] += 1
+        return self._fetch(ticker, background=False).result()
+
+    def refresh(self, ticker: str) -> Future:
+        """Queue a background refresh for one ticker."""
+        return self._fetch(ticker.upper(), background=True)
+
+    def refresh_all(self) -> Dict[str, Future]:
+        """Queue background refreshes for every stored ticker that is no longer fresh."""
+        now = time.time()
+        with self._db_lock:
+            rows = self._conn.execute("SELECT ticker, fetched_at FROM fundamentals").fetchall()
+        return {
+            ticker: self.refresh(ticker)
+            for ticker, fetched_at in rows
+            if not self._is_fresh(fetched_at, now)
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    # Offline hit/miss benchmark against a stub fetcher
+    from statistics import median
+
+    FETCH_LATENCY = 0.2
+
+    def stub_fetcher(ticker: str) -> Dict:
+        time.sleep(FETCH_LATENCY)
+        return {"revenue": {"2024-12-31": 1.0e9}, "net_income": {"2024-12-31": 1.0e8}}
+
+    store = FundamentalsStore(stub_fetcher, path=":memory:")
+
+    start = time.perf_counter()
+    store.get("AAPL")
+    miss_ms = (time.perf_counter() - start) * 1000
+
+    hit_times = []
+    for _ in range(1000):
+        start = time.perf_counter()
+        store.get("AAPL")
+        hit_times.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=store.get, args=("MSFT",)) for _ in range(50)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    burst_ms = (time.perf_counter() - start) * 1000
+
+    print(f"miss latency:        {miss_ms:.1f} ms")
+    print(f"hit latency (p50):   {median(hit_times):.3f} ms")
+    print(f"50 concurrent misses: {burst_ms:.1f} ms, upstream fetches: {store.stats['fetches'] - 1}")
+    store.close()
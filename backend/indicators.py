@@ -0,0 +1,217 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+logger = logging.getLogger(__name__)
+
+WEEKS_PER_YEAR = 52
+SMA_WINDOWS = (10, 20)
+EMA_SPANS = (12, 26)
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2.0
+VOLATILITY_WINDOW = 13
+# Bars of history a rolling window needs before the first recomputed bar (+1 for returns)
+LOOKBACK = max(*SMA_WINDOWS, BOLLINGER_WINDOW, VOLATILITY_WINDOW) + 1
+
+INDICATOR_COLUMNS = [
+    *(f"sma_{w}" for w in SMA_WINDOWS),
+    *(f"ema_{s}" for s in EMA_SPANS),
+    f"rsi_{RSI_PERIOD}",
+    f"atr_{ATR_PERIOD}",
+    "bb_upper", "bb_middle", "bb_lower",
+    f"realized_vol_{VOLATILITY_WINDOW}",
+    "drawdown",
+]
+# Smoothing state kept alongside the indicators so appended bars continue the recursion
+STATE_COLUMNS = ["_avg_gain", "_avg_loss"]
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """
+    Trailing sum over ``window`` rows along axis 0 from one cumulative sum; NaN unless
+    all rows in the window are present (so leading/padding NaNs do not poison the sums).
+    """
+    present = ~np.isnan(x)
+    pad = np.zeros((1, *x.shape[1:]))
+    sums = np.cumsum(np.concatenate([pad, np.where(present, x, 0.0)]), axis=0)
+    counts = np.cumsum(np.concatenate([pad, present]), axis=0)
+    out = np.full(x.shape, np.nan)
+    if len(x) >= window:
+        full = counts[window:] - counts[:-window] == window
+        out[window - 1:] = np.where(full, sums[window:] - sums[:-window], np.nan)
+    return out
+
+
+def sma(x: np.ndarray, window: int) -> np.ndarray:
+    return rolling_sum(x, window) / window
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """Sample standard deviation over a trailing window, from running sums of x and x^2."""
+    mean = sma(x, window)
+    variance = (rolling_sum(x * x, window) - window * mean * mean) / (window - 1)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def recursive_mean(x: np.ndarray, alpha: float, prev=None) -> np.ndarray:
+    """
+    Exponential smoothing y[t] = alpha * x[t] + (1 - alpha) * y[t-1] along axis 0.
+
+    One pass over time, vectorized across columns. Starts from ``prev`` (the value
+    before x[0]) when continuing an existing series, otherwise from the first non-NaN x.
+    """
+    out = np.empty(x.shape)
+    prev = np.full(x.shape[1:], np.nan) if prev is None else np.asarray(prev, dtype=np.float64)
+    for t in range(len(x)):
+        prev = np.where(np.isnan(prev), x[t], alpha * x[t] + (1 - alpha) * prev)
+        out[t] = prev
+    return out
+
+
+def compute_indicators(high, low, close, state: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """
+    All indicators for bars laid out along axis 0 (one series, or one column per symbol).
+
+    Args:
+        high, low, close: Price arrays of the same shape
+        state: Values at the bar just before these arrays when continuing a series:
+            the previous row of every indicator/state column plus "close" and "peak"
+
+    Returns:
+        Dict[str, np.ndarray]: INDICATOR_COLUMNS and STATE_COLUMNS, same shape as close
+    """
+    state = state or {}
+    close = close.astype(np.float64)
+    prev_close = np.empty(close.shape)
+    prev_close[0] = state.get("close", np.nan)
+    prev_close[1:] = close[:-1]
+
+    out = {f"sma_{w}": sma(close, w) for w in SMA_WINDOWS}
+    for span in EMA_SPANS:
+        out[f"ema_{span}"] = recursive_mean(close, 2 / (span + 1), state.get(f"ema_{span}"))
+
+    # Wilder's RSI and ATR: smoothing with alpha = 1 / period
+    change = close - prev_close
+    out["_avg_gain"] = recursive_mean(np.where(np.isnan(change), np.nan, np.maximum(change, 0)),
+                                      1 / RSI_PERIOD, state.get("_avg_gain"))
+    out["_avg_loss"] = recursive_mean(np.where(np.isnan(change), np.nan, np.maximum(-change, 0)),
+                                      1 / RSI_PERIOD, state.get("_avg_loss"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = out["_avg_gain"] / out["_avg_loss"]
+        out[f"rsi_{RSI_PERIOD}"] = np.where(out["_avg_loss"] == 0, 100.0, 100 - 100 / (1 + rs))
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    out[f"atr_{ATR_PERIOD}"] = recursive_mean(true_range, 1 / ATR_PERIOD, state.get(f"atr_{ATR_PERIOD}"))
+
+    middle = sma(close, BOLLINGER_WINDOW)
+    width = BOLLINGER_WIDTH * rolling_std(close, BOLLINGER_WINDOW)
+    out["bb_upper"], out["bb_middle"], out["bb_lower"] = middle + width, middle, middle - width
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = np.log(close / prev_close)
+    out[f"realized_vol_{VOLATILITY_WINDOW}"] = rolling_std(log_returns, VOLATILITY_WINDOW) * np.sqrt(WEEKS_PER_YEAR)
+
+    peak = np.fmax.accumulate(close, axis=0)
+    if "peak" in state:
+        peak = np.fmax(peak, state["peak"])
+    out["drawdown"] = close / peak - 1
+    return out
+
+
+class IndicatorEngine:
+    """
+    Technical indicators for every symbol, precomputed and kept current.
+
+    The initial pass lays all symbols out as columns of one (position x symbol)
+    matrix, so every kernel is a single O(bars) sweep. Appended bars only
+    recompute each touched symbol's tail: rolling windows re-read the last
+    LOOKBACK bars and the smoothed series continue from their stored state.
+
+    Args:
+        store: Price store to read bars from
+    """
+
+    def __init__(self, store: PriceStore):
+        self.store = store
+        self._series: Dict[str, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        self._compute_all()
+
+    def _compute_all(self) -> None:
+        symbols = self.store.symbol_array
+        n = len(symbols)
+        boundaries = np.ones(n, dtype=bool)
+        boundaries[1:] = symbols[1:] != symbols[:-1]
+        starts = np.flatnonzero(boundaries)
+        groups = np.cumsum(boundaries) - 1
+        positions = np.arange(n) - starts[groups]
+        shape = (int(positions.max()) + 1 if n else 0, len(starts))
+
+        def layout(values: np.ndarray) -> np.ndarray:
+            matrix = np.full(shape, np.nan)
+            matrix[positions, groups] = values
+            return matrix
+
+        columns = self.store.columns
+        results = compute_indicators(*(layout(columns[c]) for c in ("High", "Low", "Close")))
+        flat = {name: values[positions, groups] for name, values in results.items()}
+        ends = np.append(starts[1:], n)
+        for start, end in zip(starts, ends):
+            series = {"Date": self.store.dates[start:end]}
+            series.update({name: values[start:end] for name, values in flat.items()})
+            self._series[symbols[start]] = series
+        logger.info(f"Computed indicators for {len(starts)} symbols")
+
+    def update(self, bars: pd.DataFrame) -> None:
+        """
+        Recompute only what newly stored bars affect.
+
+        Args:
+            bars: Bars already upserted into the store (parsed Date and Symbol columns)
+        """
+        for symbol, symbol_bars in bars.groupby(bars["Symbol"].astype(str)):
+            views = self.store.arrays(symbol)
+            first = int(np.searchsorted(views["Date"], symbol_bars["Date"].min().to_datetime64()))
+            start = max(first - LOOKBACK, 0)
+            with self._lock:
+                old = self._series.get(symbol)
+
+            if old is None or start == 0:
+                # New symbol or short history: recompute it whole
+                series = {"Date": views["Date"]}
+                series.update(compute_indicators(*(views[c] for c in ("High", "Low", "Close"))))
+            else:
+                state = {name: old[name][start - 1] for name in [*INDICATOR_COLUMNS, *STATE_COLUMNS]}
+                state["close"] = views["Close"][start - 1]
+                state["peak"] = np.max(views["Close"][:start])
+                tail = compute_indicators(*(views[c][start:] for c in ("High", "Low", "Close")), state=state)
+                series = {"Date": views["Date"]}
+                series.update({name: np.concatenate([old[name][:first], values[first - start:]])
+                               for name, values in tail.items()})
+            with self._lock:
+                self._series[symbol] = series
+        logger.info(f"Updated indicators for {bars['Symbol'].nunique()} symbols from {len(bars)} new bars")
+
+    def get(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> pd.DataFrame:
+        """Indicators for one symbol, optionally limited to an inclusive ISO date range."""
+        with self._lock:
+            series = self._series.get(symbol)
+        if series is None:
+            return pd.DataFrame(columns=["Date", *INDICATOR_COLUMNS])
+        lo = 0 if start is None else np.searchsorted(series["Date"], np.datetime64(start), side="left")
+        hi = len(series["Date"]) if end is None else np.searchsorted(series["Date"], np.datetime64(end), side="right")
+        return pd.DataFrame({name: series[name][lo:hi] for name in ["Date", *INDICATOR_COLUMNS]})
+
+    def latest(self, symbol: str) -> Dict[str, float]:
+        """Most recent value of every indicator (empty if the symbol is unknown)."""
+        with self._lock:
+            series = self._series.get(symbol)
+        if series is None or len(series["Date"]) == 0:
+            return {}
+        return {name: float(series[name][-1]) for name in INDICATOR_COLUMNS}
@@ -0,0 +1,31 @@
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyResource(Generic[T]):
+    """
+    Builds an expensive object on first use, exactly once, even under concurrent access.
+
+    Args:
+        factory: Zero-argument callable that creates the resource
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from storage import CACHE_DIR, DAY, connect_sqlite
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in prompt templates don't split the cache."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM completions keyed by (model, temperature, normalized prompt).
+
+    Entries expire after ``ttl`` seconds unless they were stored with a data version:
+    a versioned key changes whenever the underlying data does, so those entries are
+    pinned until evicted. The least recently used entries are evicted beyond ``max_entries``.
+
+    Args:
+        path: SQLite database file
+        ttl: Lifetime of unversioned entries in seconds
+        max_entries: Maximum number of stored completions
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(CACHE_DIR, "llm_cache.sqlite"),
+        ttl: float = 7 * DAY,
+        max_entries: int = 5000,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "saved_tokens": 0}
+
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, tokens INTEGER NOT NULL, "
+            "pinned INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def key(self, model: str, temperature: float, prompt: str, version: Optional[str] = None) -> str:
+        payload = json.dumps([model, temperature, normalize_prompt(prompt), version])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, tokens, pinned, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not row[2] and now - row[3] > self.ttl:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+            self.stats["saved_tokens"] += row[1]
+            return row[0]
+
+    def set(self, key: str, response: str, tokens: int, pinned: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions (key, response, tokens, pinned, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, tokens, int(pinned), now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": entries,
+        }
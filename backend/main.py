@@ -1,23 +1,43 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Dict, List
 import requests
 from datetime import datetime, timedelta, date
 from huggingface_hub import InferenceClient
-from groq import Groq 
+from groq import Groq, AsyncGroq
+import asyncio
 import os
 from dotenv import load_dotenv
 import yfinance as yf
 import math
+import re
 import fastapi.middleware.cors as cors
+import logging
+from ticker_resolver import TickerResolver, normalize_company_name
+from fundamentals_store import FundamentalsStore
+from single_flight import SingleFlight
+from prerank import PreRanker
+from relevance import RELEVANCE_RETRIES, max_response_tokens, parse_scores, plan_batches, response_schema
+from news_client import NewsAPIClient, NEWS_API_TIMEOUT
+from article_store import ArticleStore
+from contextlib import asynccontextmanager
 # Load environment variables
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI()
 from fastapi.middleware.cors import CORSMiddleware
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release the pooled NewsAPI connections
+    await news_processor.news_client.aclose()
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Apply CORS middleware correctly
 app.add_middleware(
@@ -33,21 +53,49 @@ HF_API_TOKEN = os.getenv("HF_API_KEY")
 GROQ_API_TOKEN = os.getenv("GROQ_API_KEY")
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
+# Relevance scoring settings
+RELEVANCE_CONCURRENCY = int(os.getenv("RELEVANCE_CONCURRENCY", "4"))
+RELEVANCE_TIMEOUT = float(os.getenv("RELEVANCE_TIMEOUT", "15"))
+# Upper bound on companies per batch request
+MAX_BATCH_COMPANIES = int(os.getenv("MAX_BATCH_COMPANIES", "25"))
+
 # NewsProcessor class to handle news-related tasks
 class NewsProcessor:
-    def __init__(self, groq_api_token, news_api_key):
+    def __init__(self, groq_api_token, news_api_key,
+                 max_concurrency: int = RELEVANCE_CONCURRENCY,
+                 timeout: float = RELEVANCE_TIMEOUT,
+                 news_transport=None):
         self.client = Groq(api_key=groq_api_token)
+        self.async_client = AsyncGroq(api_key=groq_api_token)
         self.news_api_key = news_api_key
+        # Keep-alive pool shared by all requests; pass news_transport to test against a stub
+        self.news_client = NewsAPIClient(news_api_key, transport=news_transport)
+        # Scored articles are remembered so only unseen stories reach the LLM
+        self.article_store = ArticleStore()
+        # Local BM25/MiniLM ranking picks which new articles are worth an LLM call
+        self.preranker = PreRanker()
+        self.session = requests.Session()
+        self.timeout = timeout
+        # Caps the number of in-flight scoring calls across all requests
+        self.semaphore = asyncio.Semaphore(max_concurrency)
 
     def fetch_articles(self, company_name: str):
         yesterday_date = (date.today() - timedelta(days=2)).isoformat()
         current_date = date.today().isoformat()
-        url = f"https://newsapi.org/v2/everything?q={company_name}&language=en&from={yesterday_date}&to={current_date}&sortBy=relevancy&pageSize=20&apiKey={self.news_api_key}"
-        response = requests.get(url)
+        params = {
+            "q": company_name, "language": "en", "from": yesterday_date, "to": current_date,
+            "sortBy": "relevancy", "pageSize": 20, "apiKey": self.news_api_key,
+        }
+        response = self.session.get("https://newsapi.org/v2/everything", params=params, timeout=NEWS_API_TIMEOUT)
         if response.status_code != 200:
             raise Exception("Failed to fetch articles from NewsAPI")
         return response.json().get("articles", [])
 
+    async def fetch_articles_async(self, company_name: str):
+        yesterday_date = (date.today() - timedelta(days=2)).isoformat()
+        current_date = date.today().isoformat()
+        return await self.news_client.everything(company_name, yesterday_date, current_date)
+
     def filter_articles_by_title(self, articles, company_name):
         filtered_articles = [
             article for article in articles
@@ -68,32 +116,79 @@ class NewsProcessor:
             processed_articles.append(processed_article)
         return processed_articles
 
-    def evaluate_relevance_batch(self, batch):
+    def build_relevance_prompt(self, batch, ids=None):
+        ids = ids or [str(i) for i in range(1, len(batch) + 1)]
         prompt = (
             "You are an expert financial analyst. Your task is to evaluate the relevance of the following news articles "
             "for making investment decisions. Consider factors such as financial performance, market trends, strategic announcements, "
             "regulatory changes, or other material information that could impact the company's stock price. "
-            "Provide a relevance score between 0 and 1 for each article, separated by commas.\n\n"
+            "Provide a relevance score between 0 and 1 for each article.\n\n"
         )
-        for i, article in enumerate(batch, 1):
-            prompt += f"Article {i}:\n"
+        for article_id, article in zip(ids, batch):
+            prompt += f"Article {article_id}:\n"
+            if article.get("company"):
+                prompt += f"Company: {article['company']}\n"
             prompt += f"Title: {article['title']}\n"
             prompt += f"Description: {article['description']}\n"
             prompt += f"Content: {article['content']}\n\n"
-        prompt += "Relevance Scores (comma-separated):"
+        prompt += (
+            "Respond with only a JSON object matching this JSON schema, with one entry per article id "
+            f"({', '.join(ids)}): {response_schema()}\n"
+            'Example: {"scores": {"' + ids[0] + '": 0.8}}'
+        )
+        return prompt
 
-        try:
-            response = self.client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=50,
-            )
-            scores = [float(score.strip()) for score in response.choices[0].message.content.split(",")]
-        except Exception as e:
-            print(f"Error during evaluation: {e}")
-            scores = [0.0] * len(batch)
-        return scores
+    def relevance_request(self, batch, ids):
+        return {
+            "model": "llama-3.1-8b-instant",
+            "messages": [{"role": "user", "content": self.build_relevance_prompt(batch, ids)}],
+            "temperature": 0.1,
+            "max_tokens": max_response_tokens(len(batch)),
+            "response_format": {"type": "json_object"},
+        }
+
+    def evaluate_relevance_batch(self, batch):
+        """Scores aligned with batch; only articles left unscored are re-asked, and any still missing get 0.0."""
+        ids = [str(i) for i in range(1, len(batch) + 1)]
+        scores = {}
+        for attempt in range(RELEVANCE_RETRIES + 1):
+            pending = [article_id for article_id in ids if article_id not in scores]
+            if not pending:
+                break
+            try:
+                response = self.client.chat.completions.create(
+                    **self.relevance_request([batch[int(i) - 1] for i in pending], pending)
+                )
+                scores.update(parse_scores(response.choices[0].message.content, pending))
+            except Exception as e:
+                print(f"Error during evaluation: {e}")
+        return [scores.get(article_id, 0.0) for article_id in ids]
+
+    async def evaluate_relevance_batch_async(self, batch):
+        """
+        Score one batch with the async client, bounded by the shared semaphore and timeout.
+
+        Articles the model skips or scores invalidly are re-asked on their own (up to
+        RELEVANCE_RETRIES times); entries still missing afterwards are None.
+        """
+        ids = [str(i) for i in range(1, len(batch) + 1)]
+        scores = {}
+        for attempt in range(RELEVANCE_RETRIES + 1):
+            pending = [article_id for article_id in ids if article_id not in scores]
+            if not pending:
+                break
+            try:
+                async with self.semaphore:
+                    response = await asyncio.wait_for(
+                        self.async_client.chat.completions.create(
+                            **self.relevance_request([batch[int(i) - 1] for i in pending], pending)
+                        ),
+                        timeout=self.timeout,
+                    )
+                scores.update(parse_scores(response.choices[0].message.content, pending))
+            except Exception as e:
+                print(f"Error during evaluation: {e!r}")
+        return [scores.get(article_id) for article_id in ids]
 
     def get_top_articles(self, company_name: str):
         # Fetch articles
@@ -105,13 +200,14 @@ class NewsProcessor:
         # Preprocess articles
         processed_articles = self.preprocess_articles(filtered_articles)
 
-        # Evaluate relevance in batches
-        batch_size = 5
-        for i in range(0, len(processed_articles), batch_size):
-            batch = processed_articles[i:i + batch_size]
+        # Only the locally best-ranked articles are sent to the LLM
+        processed_articles = self.preranker.select(company_name, processed_articles)
+
+        # Evaluate relevance in batches sized to the prompt token budget
+        for batch in plan_batches(processed_articles):
             scores = self.evaluate_relevance_batch(batch)
-            for j, article in enumerate(batch):
-                article["relevance_score"] = scores[j]
+            for article, score in zip(batch, scores):
+                article["relevance_score"] = score
 
         # Sort articles by relevance score
         sorted_articles = sorted(processed_articles, key=lambda x: x.get("relevance_score", 0.0), reverse=True)
@@ -120,13 +216,117 @@ class NewsProcessor:
         top_articles = sorted_articles[:5]
         return top_articles
 
+    async def score_articles(self, articles):
+        """
+        Score articles in concurrent batches, setting ``relevance_score`` on each.
+
+        Returns:
+            list: The articles that received a real score (ones left unscored after retries get 0.0)
+        """
+        # Fan out all batches at once; the semaphore caps concurrency
+        batches = plan_batches(articles)
+        results = await asyncio.gather(*(self.evaluate_relevance_batch_async(batch) for batch in batches))
+
+        scored_articles = []
+        for batch, scores in zip(batches, results):
+            for article, score in zip(batch, scores):
+                article["relevance_score"] = 0.0 if score is None else score
+                if score is not None:
+                    scored_articles.append(article)
+        return scored_articles
+
+    async def prerank_async(self, company_name: str, articles):
+        # MiniLM encoding (and its first-use model load) would block the event loop; BM25 is cheap
+        if self.preranker.method == "embedding":
+            return await asyncio.to_thread(self.preranker.select, company_name, articles)
+        return self.preranker.select(company_name, articles)
+
+    async def get_top_articles_async(self, company_name: str):
+        """
+        Same pipeline as get_top_articles, but all batches are scored concurrently.
+
+        Articles already scored for this company (same URL, same content or a
+        syndicated near-copy) reuse their stored score, so only new stories are
+        sent to the LLM. Batches that fail or time out keep a score of 0.0, so one
+        slow LLM call degrades the ranking instead of failing the whole request;
+        those scores are not stored.
+        """
+        # Fetch articles over the pooled async client
+        articles = await self.fetch_articles_async(company_name)
+
+        # Filter and preprocess articles
+        filtered_articles = self.filter_articles_by_title(articles, company_name)
+        processed_articles = self.preprocess_articles(filtered_articles)
+
+        # Reuse stored scores; near-duplicate copies within this fetch are dropped
+        company_key = normalize_company_name(company_name)
+        known_articles, new_articles, _ = self.article_store.partition(company_key, processed_articles)
+        new_articles = await self.prerank_async(company_name, new_articles)
+
+        scored_articles = await self.score_articles(new_articles)
+        self.article_store.save(company_key, scored_articles)
+
+        # Sort articles by relevance score and select the top 5
+        sorted_articles = sorted(known_articles + new_articles, key=lambda x: x.get("relevance_score", 0.0), reverse=True)
+        return sorted_articles[:5]
+
+
+    async def get_top_articles_many_async(self, company_names: List[str]) -> Dict[str, Dict]:
+        """
+        Top articles for several companies: fetches run concurrently and every
+        company's new articles are scored together in shared LLM batches.
+
+        Returns:
+            Dict[str, Dict]: {company: {"top_articles": [...]}} or {company: {"error": str}}
+        """
+        fetched = await asyncio.gather(
+            *(self.fetch_articles_async(company_name) for company_name in company_names),
+            return_exceptions=True,
+        )
+
+        results, candidates, pending = {}, {}, []
+        for company_name, articles in zip(company_names, fetched):
+            if isinstance(articles, BaseException):
+                results[company_name] = {"error": str(articles)}
+                continue
+            filtered_articles = self.filter_articles_by_title(articles, company_name)
+            processed_articles = self.preprocess_articles(filtered_articles)
+            company_key = normalize_company_name(company_name)
+            known_articles, new_articles, _ = self.article_store.partition(company_key, processed_articles)
+            new_articles = await self.prerank_async(company_name, new_articles)
+            candidates[company_name] = known_articles + new_articles
+            # Tag articles so a shared batch tells the LLM which company each one is about
+            for article in new_articles:
+                article["company"] = company_name
+            pending.extend(new_articles)
+
+        scored_by_company = {}
+        for article in await self.score_articles(pending):
+            scored_by_company.setdefault(article["company"], []).append(article)
+        for article in pending:
+            del article["company"]
+        for company_name, articles in scored_by_company.items():
+            self.article_store.save(normalize_company_name(company_name), articles)
+
+        for company_name, articles in candidates.items():
+            sorted_articles = sorted(articles, key=lambda x: x.get("relevance_score", 0.0), reverse=True)
+            results[company_name] = {"top_articles": sorted_articles[:5]}
+        return results
+
 
 # FinancialProcessor class to handle financial data fetching and ticker inference
 class FinancialProcessor:
     def __init__(self, groq_api_token):
         self.client = Groq(api_key=groq_api_token)
+        # Local directory + persisted LLM answers; the LLM is only asked on a miss
+        self.ticker_resolver = TickerResolver(self.infer_ticker_symbol_llm)
+        # Income statements change a few times a year, so serve them from the local store
+        self.fundamentals = FundamentalsStore(self.fetch_financial_data)
+
+    def infer_ticker_symbol(self, company_name):
+        return self.ticker_resolver.resolve(company_name)
 
-    def infer_ticker_symbol(self,company_name):
+    def infer_ticker_symbol_llm(self,company_name):
         prompt = (
             f"You are an expert in finance. Given the company name '{company_name}', "
             "provide its stock ticker symbol ."
@@ -145,33 +345,65 @@ class FinancialProcessor:
             print(f"Error during ticker inference: {e}")
             raise ValueError("Failed to infer ticker symbol")
 
-    def get_financial_data(self, ticker_symbol: str):
-        """Fetch financial data for a given ticker symbol using yfinance."""
+    def infer_ticker_symbols_llm(self, company_names: List[str]) -> Dict[str, str]:
+        """Ask for the tickers of several companies in one completion; unparsed names are left out."""
+        listing = "\n".join(f"{i}. {name}" for i, name in enumerate(company_names, 1))
+        prompt = (
+            "You are an expert in finance. Provide the stock ticker symbol of each company below. "
+            "Answer with one line per company in the form '<number>: <TICKER>' and nothing else.\n\n"
+            f"{listing}"
+        )
         try:
-            company = yf.Ticker(ticker_symbol)
-            income_statement = company.financials
+            response = self.client.chat.completions.create(
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.1,
+                max_tokens=12 * len(company_names),
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            print(f"Error during batch ticker inference: {e}")
+            return {}
+        tickers = {}
+        for number, ticker in re.findall(r"^\s*(\d+)[.:)]\s*:?\s*([A-Za-z.\-]+)\s*$", content, re.MULTILINE):
+            if 1 <= int(number) <= len(company_names):
+                tickers[company_names[int(number) - 1]] = ticker.upper()
+        return tickers
+
+    def infer_ticker_symbols(self, company_names: List[str]) -> Dict[str, str]:
+        return self.ticker_resolver.resolve_many(company_names, self.infer_ticker_symbols_llm)
+
+    def fetch_financial_data(self, ticker_symbol: str):
+        """Fetch financial data for a given ticker symbol using yfinance."""
+        company = yf.Ticker(ticker_symbol)
+        income_statement = company.financials
 
-            # Check if required fields exist
-            if "Total Revenue" not in income_statement.index or "Net Income" not in income_statement.index:
-                raise ValueError("Financial data (revenue or profit) not available for the given ticker symbol.")
+        # Check if required fields exist
+        if "Total Revenue" not in income_statement.index or "Net Income" not in income_statement.index:
+            raise ValueError("Financial data (revenue or profit) not available for the given ticker symbol.")
 
-            # Extract revenue and net income for the last 5 years
-            revenue = income_statement.loc["Total Revenue"].iloc[:5].to_dict()
-            net_income = income_statement.loc["Net Income"].iloc[:5].to_dict()
+        # Extract revenue and net income for the last 5 years
+        revenue = income_statement.loc["Total Revenue"].iloc[:5].to_dict()
+        net_income = income_statement.loc["Net Income"].iloc[:5].to_dict()
 
-            # Replace NaN values with None (or 0)
-            def replace_nan(value):
-                return value if not math.isnan(value) else None
+        # Replace NaN values with None (or 0)
+        def replace_nan(value):
+            return value if not math.isnan(value) else None
 
-            revenue = {str(year): replace_nan(value) for year, value in revenue.items()}
-            net_income = {str(year): replace_nan(value) for year, value in net_income.items()}
+        revenue = {str(year): replace_nan(value) for year, value in revenue.items()}
+        net_income = {str(year): replace_nan(value) for year, value in net_income.items()}
 
-            # Format the data
-            financial_data = {
-                "revenue": revenue,
-                "net_income": net_income
-            }
-            return financial_data
+        # Format the data
+        financial_data = {
+            "revenue": revenue,
+            "net_income": net_income
+        }
+        return financial_data
+
+    def get_financial_data(self, ticker_symbol: str):
+        """Return cached financial data, fetching from yfinance only when the store is stale."""
+        try:
+            return self.fundamentals.get(ticker_symbol)
         except Exception as e:
             logger.error(f"Error in get_financial_data: {e}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -180,6 +412,8 @@ class FinancialProcessor:
 # Instantiate the classes
 news_processor = NewsProcessor(GROQ_API_TOKEN, NEWS_API_KEY)
 financial_processor = FinancialProcessor(GROQ_API_TOKEN)
+# Concurrent identical requests (dashboard widgets, popular tickers) share one upstream computation
+single_flight = SingleFlight()
 
 # Define request models for the API
 class CompanyRequest(BaseModel):
@@ -190,6 +424,20 @@ class FinancialRequest(BaseModel):
     ticker_symbol: str
 
 
+class CompaniesRequest(BaseModel):
+    company_names: List[str]
+
+
+def clean_company_names(company_names: List[str]) -> List[str]:
+    """Strip names and drop blanks/duplicates, keeping order."""
+    names = list(dict.fromkeys(name.strip() for name in company_names if name.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="Company names cannot be empty")
+    if len(names) > MAX_BATCH_COMPANIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_COMPANIES} companies per request")
+    return names
+
+
 # API endpoint for top articles
 @app.post("/get-top-articles/")
 async def get_top_articles_endpoint(request: CompanyRequest):
@@ -198,7 +446,10 @@ async def get_top_articles_endpoint(request: CompanyRequest):
         raise HTTPException(status_code=400, detail="Company name cannot be empty")
 
     try:
-        top_articles = news_processor.get_top_articles(company_name)
+        top_articles = await single_flight.do(
+            ("top-articles", company_name.lower()),
+            lambda: news_processor.get_top_articles_async(company_name),
+        )
         return {"top_articles": top_articles}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -212,13 +463,62 @@ async def get_financial_data_endpoint(request: CompanyRequest):
     if not company_name:
         raise HTTPException(status_code=400, detail="Company name cannot be empty")
 
-    try:
+    async def fetch():
         # Infer the ticker symbol using the FinancialProcessor
-        ticker_symbol = financial_processor.infer_ticker_symbol(company_name)
+        ticker_symbol = await asyncio.to_thread(financial_processor.infer_ticker_symbol, company_name)
 
         # Fetch financial data using the FinancialProcessor
-        financial_data = financial_processor.get_financial_data(ticker_symbol)
+        financial_data = await asyncio.to_thread(financial_processor.get_financial_data, ticker_symbol)
         return {"ticker_symbol": ticker_symbol, "financial_data": financial_data}
+
+    try:
+        return await single_flight.do(("financial-data", normalize_company_name(company_name)), fetch)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Batch endpoints: one request for a whole dashboard/sector view
+@app.post("/get-top-articles/batch/")
+async def get_top_articles_batch_endpoint(request: CompaniesRequest):
+    company_names = clean_company_names(request.company_names)
+    # The shared work answers with these exact names in this order, so only identical lists may share it
+    key = ("top-articles-batch", tuple(company_names))
+    try:
+        results = await single_flight.do(key, lambda: news_processor.get_top_articles_many_async(company_names))
+        return {"results": [{"company_name": name, **results[name]} for name in company_names]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/get-financial-data/batch/")
+async def get_financial_data_batch_endpoint(request: CompaniesRequest):
+    company_names = clean_company_names(request.company_names)
+
+    async def fetch():
+        # Local lookups first, then one LLM call for every unresolved name
+        tickers = await asyncio.to_thread(financial_processor.infer_ticker_symbols, company_names)
+        unique_tickers = list(dict.fromkeys(tickers.values()))
+        # The fundamentals store coalesces and caches per ticker; fetch all at once
+        fetched = await asyncio.gather(
+            *(asyncio.to_thread(financial_processor.get_financial_data, ticker) for ticker in unique_tickers),
+            return_exceptions=True,
+        )
+        financials = dict(zip(unique_tickers, fetched))
+        results = []
+        for name in company_names:
+            if name not in tickers:
+                results.append({"company_name": name, "error": "Failed to infer ticker symbol"})
+                continue
+            data = financials[tickers[name]]
+            if isinstance(data, BaseException):
+                results.append({"company_name": name, "ticker_symbol": tickers[name], "error": getattr(data, "detail", str(data))})
+            else:
+                results.append({"company_name": name, "ticker_symbol": tickers[name], "financial_data": data})
+        return {"results": results}
+
+    key = ("financial-data-batch", tuple(company_names))
+    try:
+        return await single_flight.do(key, fetch)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
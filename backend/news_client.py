@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_URL = os.getenv("NEWS_API_URL", "https://newsapi.org/v2")
+NEWS_API_TIMEOUT = float(os.getenv("NEWS_API_TIMEOUT", "10"))
+NEWS_API_RETRIES = int(os.getenv("NEWS_API_RETRIES", "2"))
+NEWS_API_MAX_CONNECTIONS = int(os.getenv("NEWS_API_MAX_CONNECTIONS", "20"))
+
+# Worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class NewsAPIError(Exception):
+    pass
+
+
+class NewsAPIClient:
+    """
+    Async NewsAPI client sharing one keep-alive connection pool across requests.
+
+    Query parameters are URL-encoded by httpx, every call is bounded by ``timeout``,
+    and rate-limit/5xx responses and connection errors are retried with exponential
+    backoff (honouring Retry-After up to ``timeout``; longer waits fail fast). Pass ``transport`` (e.g. httpx.MockTransport or
+    httpx.ASGITransport) to run against a local stub instead of the network.
+
+    Args:
+        api_key: NewsAPI key, sent as the X-Api-Key header
+        base_url: API root
+        timeout: Seconds allowed for each attempt
+        retries: Extra attempts after the first one
+        backoff: Base delay in seconds, doubled on every retry
+        transport: Optional httpx transport override
+        max_connections: Size of the connection pool
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = NEWS_API_URL,
+        timeout: float = NEWS_API_TIMEOUT,
+        retries: int = NEWS_API_RETRIES,
+        backoff: float = 0.5,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        max_connections: int = NEWS_API_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Created on first use so it binds to the running event loop."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-Api-Key": self.api_key or ""},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return self._client
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None and "Retry-After" in response.headers:
+            try:
+                delay = max(float(response.headers["Retry-After"]), 0.0)
+            except ValueError:
+                pass
+            else:
+                # A rate-limit window longer than a whole attempt (e.g. the daily quota) is not worth waiting out
+                if delay > self.timeout:
+                    raise NewsAPIError(f"NewsAPI rate limit: retry after {delay:.0f}s")
+                return delay
+        return self.backoff * (2 ** attempt)
+
+    async def get(self, path: str, params: Dict) -> Dict:
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = await self.client.get(path, params=params)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    break
+                error = NewsAPIError(f"NewsAPI returned {response.status_code}")
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.retries:
+                raise NewsAPIError(f"Failed to fetch articles from NewsAPI: {error}") from error
+            delay = self._retry_delay(attempt, response)
+            logger.warning(f"NewsAPI request failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        if response.status_code != 200:
+            raise NewsAPIError(f"Failed to fetch articles from NewsAPI ({response.status_code})")
+        return response.json()
+
+    async def everything(self, query: str, from_date: str, to_date: str,
+                         page_size: int = 20, sort_by: str = "relevancy") -> List[Dict]:
+        """Search /everything; returns the raw article dicts."""
+        payload = await self.get("/everything", params={
+            "q": query,
+            "language": "en",
+            "from": from_date,
+            "to": to_date,
+            "sortBy": sort_by,
+            "pageSize": page_size,
+        })
+        return payload.get("articles", [])
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
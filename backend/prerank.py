@@ -0,0 +1,145 @@
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from lazy import LazyResource
+
+logger = logging.getLogger(__name__)
+
+# "bm25" (no extra dependencies), "embedding" (MiniLM via sentence-transformers) or "off"
+PRERANK_METHOD = os.getenv("PRERANK_METHOD", "bm25")
+# Send roughly 1/PRERANK_FACTOR of the new articles to the LLM (never fewer than the top-k returned)
+PRERANK_FACTOR = float(os.getenv("PRERANK_FACTOR", "2"))
+PRERANK_MODEL = os.getenv("PRERANK_MODEL", "all-MiniLM-L6-v2")
+# Terms that make an article about a company useful for an investment decision
+FINANCE_TERMS = (
+    "earnings revenue profit loss guidance forecast outlook quarter results shares stock "
+    "dividend buyback acquisition merger deal lawsuit regulator investigation analyst "
+    "upgrade downgrade valuation growth sales margin layoffs ceo"
+)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", (text or "").lower())
+
+
+def article_document(article: Dict) -> str:
+    # The title is repeated so it weighs more than boilerplate in the content snippet
+    return " ".join([article.get("title") or ""] * 2 + [article.get("description") or "", article.get("content") or ""])
+
+
+def bm25_scores(query: Sequence[str], documents: List[List[str]]) -> np.ndarray:
+    """Okapi BM25 of one query against a small corpus, with IDF taken from the corpus itself."""
+    n = len(documents)
+    lengths = np.array([len(document) for document in documents], dtype=np.float64)
+    average_length = lengths.mean() if n and lengths.mean() > 0 else 1.0
+    frequencies = [Counter(document) for document in documents]
+    scores = np.zeros(n)
+    for term in set(query):
+        term_counts = np.array([frequency.get(term, 0) for frequency in frequencies], dtype=np.float64)
+        containing = np.count_nonzero(term_counts)
+        if not containing:
+            continue
+        idf = math.log(1 + (n - containing + 0.5) / (containing + 0.5))
+        scores += idf * term_counts * (BM25_K1 + 1) / (
+            term_counts + BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+        )
+    return scores
+
+
+def top_k_overlap(reference: List[Dict], candidate: List[Dict], k: int = 5) -> float:
+    """Share of the reference top-k (by URL) that also appears in the candidate top-k."""
+    reference_urls = [article.get("url") for article in reference[:k]]
+    if not reference_urls:
+        return 1.0
+    candidate_urls = {article.get("url") for article in candidate[:k]}
+    return sum(url in candidate_urls for url in reference_urls) / len(reference_urls)
+
+
+class PreRanker:
+    """
+    Cheap local ranking that decides which articles are worth an LLM relevance call.
+
+    Articles are scored against a query made of the company name plus finance terms,
+    either with BM25 over the fetched articles or by cosine similarity of MiniLM
+    embeddings, and only the best ``ceil(n / factor)`` (at least ``min_candidates``)
+    go on to the LLM.
+
+    Args:
+        method: "bm25", "embedding" or "off"
+        factor: Reduction factor for the number of articles scored by the LLM
+    """
+
+    def __init__(self, method: str = PRERANK_METHOD, factor: float = PRERANK_FACTOR):
+        if method not in ("bm25", "embedding", "off"):
+            raise ValueError(f"Unknown pre-ranking method: {method}")
+        self.method = method
+        self.factor = max(factor, 1.0)
+        self._encoder = LazyResource(self._load_encoder)
+        self.stats = {"articles": 0, "sent_to_llm": 0}
+
+    def _load_encoder(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(PRERANK_MODEL)
+
+    def query(self, company_name: str) -> str:
+        return f"{company_name} {FINANCE_TERMS}"
+
+    def scores(self, company_name: str, articles: List[Dict]) -> np.ndarray:
+        documents = [article_document(article) for article in articles]
+        if self.method == "embedding":
+            vectors = self._encoder.get().encode([self.query(company_name), *documents], normalize_embeddings=True)
+            return vectors[1:] @ vectors[0]
+        # The company name is weighted like the finance vocabulary as a whole
+        query = tokenize(company_name) * len(tokenize(FINANCE_TERMS)) + tokenize(FINANCE_TERMS)
+        return bm25_scores(query, [tokenize(document) for document in documents])
+
+    def select(self, company_name: str, articles: List[Dict], min_candidates: int = 5) -> List[Dict]:
+        """The articles to send to the LLM, best pre-rank first."""
+        self.stats["articles"] += len(articles)
+        keep = max(min_candidates, math.ceil(len(articles) / self.factor))
+        if self.method == "off" or len(articles) <= keep:
+            self.stats["sent_to_llm"] += len(articles)
+            return list(articles)
+        order = np.argsort(-self.scores(company_name, articles), kind="stable")[:keep]
+        self.stats["sent_to_llm"] += keep
+        return [articles[i] for i in order]
+
+
+if __name__ == "__main__":
+    # Offline evaluation: articles already scored by the LLM (e.g. a dumped get_top_articles
+    # run with PRERANK_METHOD=off), as a JSON list of {"company", "title", ..., "relevance_score"}
+    import argparse
+    import json
+
+    from relevance import plan_batches
+
+    parser = argparse.ArgumentParser(description="Measure LLM calls saved and top-5 overlap of the pre-ranker")
+    parser.add_argument("path")
+    parser.add_argument("--method", default="bm25", choices=["bm25", "embedding"])
+    parser.add_argument("--factors", default="1,2,3,4")
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        scored = json.load(f)
+    by_company: Dict[str, List[Dict]] = {}
+    for article in scored:
+        by_company.setdefault(article["company"], []).append(article)
+
+    for factor in [float(f) for f in args.factors.split(",")]:
+        ranker = PreRanker(args.method, factor)
+        calls, overlaps = 0, []
+        for company, articles in by_company.items():
+            reference = sorted(articles, key=lambda a: a["relevance_score"], reverse=True)
+            candidates = ranker.select(company, articles)
+            calls += len(plan_batches(candidates))
+            overlaps.append(top_k_overlap(reference, sorted(candidates, key=lambda a: a["relevance_score"], reverse=True)))
+        print(f"factor {factor:g}: {ranker.stats['sent_to_llm']}/{ranker.stats['articles']} articles, "
+              f"{calls} LLM calls, mean top-5 overlap {np.mean(overlaps):.2f}")
@@ -0,0 +1,234 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+PARTITION_COLUMNS = ["Symbol", "Year"]
+
+
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """Parse bar dates, dropping any time/timezone suffix ("2023-02-03 00:00:00-05:00" -> 2023-02-03)."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        return dates.dt.normalize()
+    return pd.to_datetime(dates.astype(str).str[:10], format="%Y-%m-%d")
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("Date", pa.timestamp("ns")),
+        ("Open", pa.float64()),
+        ("High", pa.float64()),
+        ("Low", pa.float64()),
+        ("Close", pa.float64()),
+        ("Volume", pa.int64()),
+        ("Dividends", pa.float64()),
+        ("Stock Splits", pa.float64()),
+        ("Symbol", pa.string()),
+        ("Year", pa.int32()),
+    ])
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([("Symbol", pa.string()), ("Year", pa.int32())]), flavor="hive")
+
+
+def _dataset(root: str):
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    return ds.dataset(root, schema=_arrow_schema(), format="parquet", partitioning=_partitioning(),
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def read_prices(
+    root: str,
+    symbols: Optional[List[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read bars from a Parquet dataset partitioned by Symbol and Year.
+
+    Symbol and year filters prune whole partitions, the date filter is pushed down to
+    row groups, and only the requested columns are read (memory-mapped).
+
+    Args:
+        root: Dataset directory written by write_prices
+        symbols: Symbols to read (all if omitted)
+        start: First ISO date to include
+        end: Last ISO date to include
+        columns: Columns to return (Date, Symbol and all price columns if omitted)
+    """
+    import pyarrow.dataset as ds
+
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns or ["Date", "Symbol", *PRICE_COLUMNS])
+
+    expression = None
+
+    def combine(condition):
+        return condition if expression is None else expression & condition
+
+    if symbols is not None:
+        expression = combine(ds.field("Symbol").isin(list(symbols)))
+    if start is not None:
+        start_ts = pd.Timestamp(start)
+        expression = combine((ds.field("Year") >= start_ts.year) & (ds.field("Date") >= start_ts))
+    if end is not None:
+        end_ts = pd.Timestamp(end)
+        expression = combine((ds.field("Year") <= end_ts.year) & (ds.field("Date") <= end_ts))
+
+    columns = columns or ["Date", "Symbol", *PRICE_COLUMNS]
+    frame = _dataset(root).to_table(columns=columns, filter=expression).to_pandas()
+    sort_keys = [column for column in ["Symbol", "Date"] if column in frame]
+    return frame.sort_values(sort_keys, ignore_index=True) if sort_keys else frame
+
+
+def write_prices(frame: pd.DataFrame, root: str) -> None:
+    """
+    Upsert bars into a typed Parquet dataset partitioned as <root>/Symbol=<SYM>/Year=<YYYY>/.
+
+    Only the (Symbol, Year) partitions touched by ``frame`` are rewritten; existing bars
+    in them are kept unless ``frame`` has a bar for the same date.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    frame = frame[["Date", "Symbol", *PRICE_COLUMNS]].copy()
+    frame["Date"] = parse_dates(frame["Date"])
+    frame["Symbol"] = frame["Symbol"].astype(str)
+    frame["Year"] = frame["Date"].dt.year.astype("int32")
+
+    touched = frame[PARTITION_COLUMNS].drop_duplicates()
+    if os.path.isdir(root):
+        existing = read_prices(
+            root,
+            symbols=touched["Symbol"].unique().tolist(),
+            start=f"{touched['Year'].min()}-01-01",
+            end=f"{touched['Year'].max()}-12-31",
+        )
+        existing["Year"] = existing["Date"].dt.year.astype("int32")
+        existing = existing.merge(touched, on=PARTITION_COLUMNS)
+        frame = pd.concat([existing, frame], ignore_index=True)
+    frame = frame.drop_duplicates(subset=["Symbol", "Date"], keep="last").sort_values(["Symbol", "Date"])
+
+    ds.write_dataset(
+        pa.Table.from_pandas(frame, schema=_arrow_schema(), preserve_index=False),
+        root,
+        format="parquet",
+        partitioning=_partitioning(),
+        existing_data_behavior="delete_matching",
+        basename_template="part-{i}.parquet",
+    )
+    logger.info(f"Wrote {len(frame)} bars to {len(touched)} partitions under {root}")
+
+
+class PriceStore:
+    """
+    Weekly price bars held as columnar NumPy arrays, sorted by (Symbol, Date).
+
+    Dates are parsed once at load time and each symbol owns one contiguous
+    slice of every column, so per-symbol reads are O(rows for that symbol)
+    and return views rather than copies.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self._load(frame)
+
+    def _load(self, frame: pd.DataFrame) -> None:
+        dates = parse_dates(frame["Date"]).to_numpy()
+        symbols = frame["Symbol"].astype(str).to_numpy()
+        order = np.lexsort((dates, symbols))
+
+        self.dates = dates[order]
+        self.symbol_array = symbols[order]
+        self.columns: Dict[str, np.ndarray] = {
+            column: frame[column].to_numpy()[order] for column in PRICE_COLUMNS if column in frame
+        }
+
+        unique, starts, counts = np.unique(self.symbol_array, return_index=True, return_counts=True)
+        self._slices: Dict[str, slice] = {
+            symbol: slice(start, start + count) for symbol, start, count in zip(unique, starts, counts)
+        }
+        logger.info(f"Loaded {len(self.dates)} bars for {len(self._slices)} symbols")
+
+    @classmethod
+    def from_csv(cls, path: str) -> "PriceStore":
+        return cls(pd.read_csv(path))
+
+    @classmethod
+    def from_parquet(cls, root: str, symbols: Optional[List[str]] = None,
+                     start: Optional[str] = None, end: Optional[str] = None) -> "PriceStore":
+        return cls(read_prices(root, symbols=symbols, start=start, end=end))
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._slices
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._slices)
+
+    def arrays(self, symbol: str) -> Dict[str, np.ndarray]:
+        """Zero-copy views of every column for one symbol, in date order."""
+        rows = self._slices.get(symbol, slice(0, 0))
+        views = {"Date": self.dates[rows]}
+        views.update({column: values[rows] for column, values in self.columns.items()})
+        return views
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """One symbol's bars as a DataFrame with a parsed Date column."""
+        frame = pd.DataFrame(self.arrays(symbol))
+        frame.insert(1, "Symbol", symbol)
+        return frame
+
+    def data_version(self, symbol: str) -> str:
+        """Changes whenever the symbol's bars change: row count, last date and last close."""
+        views = self.arrays(symbol)
+        if len(views["Date"]) == 0:
+            return "empty"
+        return f"{len(views['Date'])}:{views['Date'][-1]}:{views['Close'][-1]}"
+
+    def version(self) -> str:
+        """Changes whenever any bar changes: row count, last date and a checksum of closes."""
+        if len(self.dates) == 0:
+            return "empty"
+        return f"{len(self.dates)}:{self.dates.max()}:{np.nansum(self.columns['Close']):.6f}"
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Date": self.dates, "Symbol": self.symbol_array, **self.columns})
+
+    def upsert(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Insert new bars, replacing existing bars with the same (Symbol, Date).
+
+        Returns:
+            pd.DataFrame: The upserted bars with parsed dates, for downstream incremental updates
+        """
+        bars = bars.copy()
+        bars["Date"] = parse_dates(bars["Date"])
+        merged = pd.concat([self.to_frame(), bars], ignore_index=True)
+        merged = merged.drop_duplicates(subset=["Symbol", "Date"], keep="last")
+        self._load(merged)
+        return bars
+
+
+if __name__ == "__main__":
+    # One-off conversion of the CSV price files into the Parquet dataset
+    for csv_path in ["../Data/stock_data.csv", "../Data/AMD_data.csv"]:
+        write_prices(pd.read_csv(csv_path), "../Data/prices")
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import re
+from typing import Annotated, Dict, List
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens allowed per scoring call (instructions + articles)
+RELEVANCE_PROMPT_TOKENS = int(os.getenv("RELEVANCE_PROMPT_TOKENS", "3000"))
+RELEVANCE_MAX_BATCH = int(os.getenv("RELEVANCE_MAX_BATCH", "10"))
+# Follow-up calls for articles the model left out or scored invalidly
+RELEVANCE_RETRIES = int(os.getenv("RELEVANCE_RETRIES", "1"))
+# Output tokens per '"12": 0.85, ' entry, plus the JSON wrapper, with headroom for
+# pretty-printed responses (newline + indentation per entry) and longer decimals
+TOKENS_PER_SCORE = 16
+RESPONSE_OVERHEAD_TOKENS = 24
+INSTRUCTION_TOKENS = 150
+
+
+# Strict: JSON true/false must not pass as 1.0/0.0, nor "0.8" as a number
+Score = Annotated[float, Field(ge=0.0, le=1.0, strict=True)]
+_score_adapter = TypeAdapter(Score)
+
+
+class RelevanceScores(BaseModel):
+    """Expected response: relevance score per article id."""
+    scores: Dict[str, Score]
+
+
+def response_schema() -> str:
+    return json.dumps(RelevanceScores.model_json_schema())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English news text)."""
+    return len(text) // 4 + 1
+
+
+def article_prompt_tokens(article: Dict) -> int:
+    return estimate_tokens(" ".join(str(article.get(field) or "") for field in ("company", "title", "description", "content"))) + 10
+
+
+def max_response_tokens(batch_size: int) -> int:
+    return RESPONSE_OVERHEAD_TOKENS + TOKENS_PER_SCORE * batch_size
+
+
+def plan_batches(articles: List[Dict], token_budget: int = RELEVANCE_PROMPT_TOKENS,
+                 max_batch: int = RELEVANCE_MAX_BATCH) -> List[List[Dict]]:
+    """
+    Greedily pack articles into batches whose estimated prompt stays within the budget.
+
+    Short articles share one call; an article larger than the budget gets a batch of its own.
+    """
+    batches, batch, used = [], [], INSTRUCTION_TOKENS
+    for article in articles:
+        tokens = article_prompt_tokens(article)
+        if batch and (used + tokens > token_budget or len(batch) >= max_batch):
+            batches.append(batch)
+            batch, used = [], INSTRUCTION_TOKENS
+        batch.append(article)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def parse_scores(content: str, ids: List[str]) -> Dict[str, float]:
+    """
+    Valid scores from a model response, keyed by article id.
+
+    Accepts {"scores": {"1": 0.8, ...}} and, leniently, a bare {"1": 0.8} object.
+    Unknown ids and values that are not numbers in [0, 1] are dropped, so the caller
+    can retry just the missing articles.
+    """
+    try:
+        payload = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        # Salvage complete '"id": score' pairs from truncated or wrapped JSON; a number cut
+        # off by the token limit ("2": 0.) is not followed by ',' or '}' and is left out
+        pairs = re.findall(r'"?(\w+)"?\s*:\s*([0-9]*\.?[0-9]+)(?=\s*[,}])', content or "")
+        payload = {"scores": {key: float(value) for key, value in pairs}}
+    if isinstance(payload, dict) and "scores" not in payload:
+        payload = {"scores": payload}
+    if not isinstance(payload, dict) or not isinstance(payload.get("scores"), dict):
+        return {}
+
+    wanted = set(ids)
+    scores = {}
+    for key, value in payload["scores"].items():
+        if str(key) not in wanted:
+            continue
+        try:
+            scores[str(key)] = _score_adapter.validate_python(value)
+        except ValidationError:
+            logger.warning(f"Dropping invalid relevance score {value!r} for article {key}")
+    return scores
@@ -0,0 +1,93 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+# Quarterly averages have always been reported rounded to 2 decimals
+ROUNDING = {"monthly": None, "quarterly": 2}
+
+
+def bucket_starts(dates: np.ndarray, granularity: str) -> np.ndarray:
+    """Map bar dates to the first day of their month or quarter."""
+    months = dates.astype("datetime64[M]")
+    if granularity == "quarterly":
+        month_numbers = months.astype(np.int64)
+        months = (month_numbers - month_numbers % 3).astype("datetime64[M]")
+    return months.astype("datetime64[ns]")
+
+
+class RollupEngine:
+    """
+    Monthly and quarterly OHLCV averages for every symbol, kept ready for lookup.
+
+    All buckets are computed in one vectorized groupby at load time. When new
+    bars arrive, only the (symbol, bucket) pairs they fall into are recomputed.
+    """
+
+    def __init__(self, store: PriceStore):
+        self.store = store
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._frames: Dict[str, Dict[str, pd.DataFrame]] = {}
+        for granularity in ROUNDING:
+            self._tables[granularity] = self._aggregate(store.symbol_array, store.dates, store.columns, granularity)
+            self._frames[granularity] = {}
+            self._refresh_frames(granularity)
+
+    def _aggregate(self, symbols, dates, columns, granularity: str) -> pd.DataFrame:
+        frame = pd.DataFrame({column: columns[column] for column in ROLLUP_COLUMNS})
+        frame["Symbol"] = symbols
+        frame["Date"] = bucket_starts(dates, granularity)
+        table = frame.groupby(["Symbol", "Date"], sort=True)[ROLLUP_COLUMNS].mean()
+        if ROUNDING[granularity] is not None:
+            table = table.round(ROUNDING[granularity])
+        return table
+
+    def _refresh_frames(self, granularity: str, symbols: Optional[Iterable[str]] = None) -> None:
+        """Rebuild the per-symbol lookup frames, for every symbol in one pass or just the given ones."""
+        table = self._tables[granularity]
+        if symbols is None:
+            groups = table.groupby(level="Symbol", sort=False)
+        else:
+            present = set(table.index.unique(level="Symbol"))
+            groups = ((symbol, table.loc[[symbol]]) for symbol in symbols if symbol in present)
+        for symbol, group in groups:
+            self._frames[granularity][symbol] = group.droplevel("Symbol").reset_index()[["Date", *ROLLUP_COLUMNS]]
+
+    def update(self, bars: pd.DataFrame) -> None:
+        """
+        Recompute only the buckets touched by newly stored bars.
+
+        Args:
+            bars: Bars already upserted into the store (parsed Date and Symbol columns)
+        """
+        symbols = bars["Symbol"].astype(str).unique()
+        for granularity in ROUNDING:
+            touched = set(zip(bars["Symbol"].astype(str), bucket_starts(bars["Date"].to_numpy(), granularity)))
+            parts = []
+            for symbol in symbols:
+                views = self.store.arrays(symbol)
+                buckets = bucket_starts(views["Date"], granularity)
+                wanted = np.array([bucket for sym, bucket in touched if sym == symbol], dtype="datetime64[ns]")
+                mask = np.isin(buckets, wanted)
+                parts.append(self._aggregate(
+                    np.full(mask.sum(), symbol), views["Date"][mask],
+                    {column: views[column][mask] for column in ROLLUP_COLUMNS}, granularity,
+                ))
+            updated = pd.concat(parts)
+            table = self._tables[granularity]
+            table = pd.concat([table.drop(updated.index, errors="ignore"), updated]).sort_index()
+            self._tables[granularity] = table
+            self._refresh_frames(granularity, symbols)
+        logger.info(f"Updated rollups for {len(symbols)} symbols from {len(bars)} new bars")
+
+    def get(self, symbol: str, granularity: str) -> pd.DataFrame:
+        frame = self._frames[granularity].get(symbol)
+        if frame is None:
+            return pd.DataFrame(columns=["Date", *ROLLUP_COLUMNS])
+        return frame
@@ -0,0 +1,121 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+from volume_bayes import load_sectors
+
+logger = logging.getLogger(__name__)
+
+WEEKS_PER_YEAR = 52
+# Trailing window for rolling volatility and relative strength
+TRAILING_WEEKS = 13
+WEIGHTINGS = ("equal", "dollar_volume")
+
+
+def quarter_ends(frame: pd.DataFrame) -> pd.DataFrame:
+    """Last weekly value of each quarter, indexed by the quarter's first day."""
+    quarterly = frame.groupby(frame.index.to_period("Q")).last()
+    quarterly.index = quarterly.index.start_time.rename("Date")
+    return quarterly
+
+
+class SectorAnalytics:
+    """
+    Sector indices, volatility, correlations and relative strength for every sector at once.
+
+    Closes and volumes are laid out as one (weeks x symbols) matrix; sector returns are
+    a weighted matrix product of member returns, so every sector is computed in the same
+    pass. Results are cached per store data version and weighting, so sector pages are
+    served from precomputed arrays until new bars arrive.
+
+    Args:
+        store: Price store to read bars from
+        sectors: Symbol -> sector mapping (defaults to the ticker directory)
+    """
+
+    def __init__(self, store: PriceStore, sectors: Optional[Dict[str, str]] = None):
+        self.store = store
+        self.sectors = sectors if sectors is not None else load_sectors()
+        self._cache: Dict[tuple, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _matrices(self):
+        """Close and volume as (weeks x symbols) matrices, NaN where a symbol has no bar."""
+        dates, rows = np.unique(self.store.dates, return_inverse=True)
+        symbols, columns = np.unique(self.store.symbol_array, return_inverse=True)
+        close = np.full((len(dates), len(symbols)), np.nan)
+        volume = np.full((len(dates), len(symbols)), np.nan)
+        close[rows, columns] = self.store.columns["Close"]
+        volume[rows, columns] = self.store.columns["Volume"]
+        return dates, symbols, close, volume
+
+    def _weights(self, symbols: np.ndarray, close: np.ndarray, volume: np.ndarray, weighting: str):
+        """(symbols x sectors) membership weights; dollar_volume weights by average traded value."""
+        sector_of = np.array([self.sectors.get(symbol, "Other") for symbol in symbols])
+        sector_names, codes = np.unique(sector_of, return_inverse=True)
+        membership = np.zeros((len(symbols), len(sector_names)))
+        membership[np.arange(len(symbols)), codes] = 1.0
+        if weighting == "dollar_volume":
+            membership *= np.nan_to_num(np.nanmean(close * volume, axis=0))[:, None]
+        return sector_names, membership
+
+    @staticmethod
+    def _weighted_returns(returns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Weighted mean of member returns per week, renormalized over members with a return that week."""
+        present = ~np.isnan(returns)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (np.where(present, returns, 0.0) @ weights) / (present @ weights)
+
+    def _compute(self, weighting: str) -> Dict:
+        dates, symbols, close, volume = self._matrices()
+        sector_names, weights = self._weights(symbols, close, volume, weighting)
+
+        returns = np.full_like(close, np.nan)
+        returns[1:] = close[1:] / close[:-1] - 1
+        sector_returns = self._weighted_returns(returns, weights)
+        market_returns = self._weighted_returns(returns, weights.sum(axis=1, keepdims=True))[:, 0]
+        sector_returns[0] = market_returns[0] = 0.0
+        sector_returns = np.nan_to_num(sector_returns)
+        market_returns = np.nan_to_num(market_returns)
+
+        index = 100 * np.cumprod(1 + sector_returns, axis=0)
+        market_index = 100 * np.cumprod(1 + market_returns)
+        weekly = pd.DataFrame(index, index=pd.DatetimeIndex(dates, name="Date"), columns=sector_names).round(4)
+        relative_strength = pd.DataFrame(index / market_index[:, None], index=weekly.index, columns=sector_names).round(4)
+
+        trailing = sector_returns[-TRAILING_WEEKS:]
+        trailing_return = index[-1] / index[max(len(index) - TRAILING_WEEKS - 1, 0)] - 1
+        market_trailing = market_index[-1] / market_index[max(len(market_index) - TRAILING_WEEKS - 1, 0)] - 1
+
+        return {
+            "sectors": sector_names.tolist(),
+            "members": {name: symbols[weights[:, i] > 0].tolist() for i, name in enumerate(sector_names.tolist())},
+            "weekly_index": weekly,
+            "quarterly_index": quarter_ends(weekly),
+            "weekly_relative_strength": relative_strength,
+            "quarterly_relative_strength": quarter_ends(relative_strength),
+            "volatility": pd.DataFrame({
+                "annualized": sector_returns[1:].std(axis=0, ddof=1) * np.sqrt(WEEKS_PER_YEAR),
+                "trailing": trailing.std(axis=0, ddof=1) * np.sqrt(WEEKS_PER_YEAR),
+            }, index=pd.Index(sector_names, name="Sector")),
+            "correlation": pd.DataFrame(np.corrcoef(sector_returns[1:].T), index=sector_names, columns=sector_names),
+            "trailing_return": pd.Series(trailing_return, index=sector_names),
+            "trailing_excess_return": pd.Series(trailing_return - market_trailing, index=sector_names),
+        }
+
+    def get(self, weighting: str = "dollar_volume") -> Dict:
+        """All sector analytics for the current data, computed once per data version."""
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"weighting must be one of {WEIGHTINGS}")
+        key = (self.store.version(), weighting)
+        with self._lock:
+            if key not in self._cache:
+                # Older versions can never be requested again
+                self._cache = {k: v for k, v in self._cache.items() if k[0] == key[0]}
+                self._cache[key] = self._compute(weighting)
+                logger.info(f"Computed sector analytics ({weighting}) for data version {key[0]}")
+            return self._cache[key]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls into one in-flight computation.
+
+    The first caller for a key starts the work; callers arriving while it runs
+    await the same task and receive the same result (or exception). Nothing is
+    cached: once the task finishes, the next call for that key starts fresh.
+    Waiters are shielded, so a client disconnecting does not cancel the work
+    for everyone else sharing it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "executions": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``fn()`` for ``key`` unless an identical call is already in flight.
+
+        Args:
+            key: Identifies identical requests (e.g. endpoint name + normalized input)
+            fn: Zero-argument callable returning the awaitable to run
+        """
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["shared"] += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+if __name__ == "__main__":
+    # Burst benchmark: 100 identical requests against a slow stub upstream
+    import time
+
+    UPSTREAM_LATENCY = 0.2
+    upstream_calls = 0
+
+    async def upstream():
+        global upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(UPSTREAM_LATENCY)
+        return {"top_articles": []}
+
+    async def main():
+        flight = SingleFlight()
+        start = time.perf_counter()
+        await asyncio.gather(*(flight.do(("top-articles", "apple"), upstream) for _ in range(100)))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"100 identical requests: {elapsed_ms:.1f} ms, upstream calls: {upstream_calls}, stats: {flight.stats}")
+
+    asyncio.run(main())
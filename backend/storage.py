@@ -0,0 +1,18 @@
+import os
+import sqlite3
+
+# Root directory for the on-disk caches (SQLite databases and JSON snapshots)
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+DAY = 24 * 3600
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite database shared across threads, creating its directory if needed.
+
+    The connection is not thread-safe on its own; callers serialize access with a lock.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return sqlite3.connect(path, check_same_thread=False)
@@ -0,0 +1,155 @@
+import csv
+import difflib
+import json
+import logging
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from storage import CACHE_DIR
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ticker_directory.json")
+STOCK_DATA_PATH = "../Data/stock_data.csv"
+# What an LLM answer must look like to be cached ("AAPL", "BRK.B", "BF-B")
+TICKER_PATTERN = re.compile(r"^[A-Z.\-]{1,6}$")
+
+# Words that do not help tell companies apart ("Apple Inc." == "apple")
+_STOP_WORDS = {
+    "the", "inc", "incorporated", "corp", "corporation", "co", "company", "companies",
+    "ltd", "limited", "plc", "llc", "lp", "sa", "ag", "nv", "holdings", "holding",
+    "group", "com", "class", "a", "b",
+}
+
+
+def normalize_company_name(name: str) -> str:
+    """Lowercase, drop punctuation and corporate suffixes: 'JPMorgan Chase & Co.' -> 'jpmorgan chase and'."""
+    name = name.lower().replace("&", " and ")
+    tokens = re.findall(r"[a-z0-9]+", name)
+    kept = [token for token in tokens if token not in _STOP_WORDS]
+    return " ".join(kept or tokens)
+
+
+class TickerResolver:
+    """
+    Resolves company names to ticker symbols without an LLM call whenever possible.
+
+    Lookup order: exact symbol, normalized name/alias from the local directory,
+    fuzzy match against the directory, cached LLM answers, and finally the LLM itself.
+
+    Args:
+        llm_resolver: Callable that asks the LLM for a ticker, used only on true misses
+        directory_path: JSON file mapping symbol -> {"name", "sector", "aliases"}
+        stock_data_path: CSV whose Symbol column is added to the known symbols
+        cache_path: JSON file persisting LLM answers across restarts
+        fuzzy_cutoff: Minimum difflib similarity ratio for a fuzzy match
+    """
+
+    def __init__(
+        self,
+        llm_resolver: Callable[[str], str],
+        directory_path: str = DIRECTORY_PATH,
+        stock_data_path: str = STOCK_DATA_PATH,
+        cache_path: Optional[str] = os.path.join(CACHE_DIR, "ticker_cache.json"),
+        cache_size: int = 4096,
+        cache_ttl: float = 30 * 24 * 3600,
+        fuzzy_cutoff: float = 0.85,
+    ):
+        self.llm_resolver = llm_resolver
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.symbols = set()
+        self.names: Dict[str, str] = {}
+        self.llm_cache = TTLCache(max_size=cache_size, ttl=cache_ttl, path=cache_path)
+        self.load_directory(directory_path)
+        self.load_symbols(stock_data_path)
+
+    def load_directory(self, path: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                directory = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"Ticker directory not found at {path}")
+            return
+        for symbol, entry in directory.items():
+            self.add(symbol, entry.get("name", symbol), entry.get("aliases", []))
+
+    def load_symbols(self, path: str) -> None:
+        """Register every symbol we hold price data for, so 'AAPL' resolves to itself."""
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    self.symbols.add(row["Symbol"].upper())
+        except FileNotFoundError:
+            logger.warning(f"Stock data not found at {path}")
+
+    def add(self, symbol: str, name: str, aliases=()) -> None:
+        symbol = symbol.upper()
+        self.symbols.add(symbol)
+        for alias in (name, *aliases):
+            self.names[normalize_company_name(alias)] = symbol
+
+    def lookup(self, company_name: str) -> Optional[str]:
+        """Resolve from local data only; returns None on a miss."""
+        stripped = company_name.strip()
+        if stripped.upper() in self.symbols:
+            return stripped.upper()
+
+        key = normalize_company_name(stripped)
+        if key in self.names:
+            return self.names[key]
+
+        close = difflib.get_close_matches(key, self.names.keys(), n=1, cutoff=self.fuzzy_cutoff)
+        if close:
+            return self.names[close[0]]
+
+        return self.llm_cache.get(key)
+
+    def remember(self, company_name: str, ticker_symbol: str) -> None:
+        """Cache an LLM answer, unless it does not look like a ticker (it would be served for a month)."""
+        if TICKER_PATTERN.match(ticker_symbol or ""):
+            self.llm_cache.set(normalize_company_name(company_name), ticker_symbol)
+        else:
+            logger.warning(f"Not caching unexpected ticker answer {ticker_symbol!r} for {company_name!r}")
+
+    def resolve(self, company_name: str) -> str:
+        ticker_symbol = self.lookup(company_name)
+        if ticker_symbol is not None:
+            return ticker_symbol
+
+        ticker_symbol = self.llm_resolver(company_name)
+        self.remember(company_name, ticker_symbol)
+        return ticker_symbol
+
+    def resolve_many(self, company_names: List[str],
+                     batch_llm_resolver: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> Dict[str, str]:
+        """
+        Resolve several names, asking the LLM once for all local misses.
+
+        Args:
+            company_names: Names to resolve
+            batch_llm_resolver: Callable mapping a list of names to {name: ticker}; names it
+                leaves out fall back to the single-name llm_resolver
+
+        Returns:
+            Dict[str, str]: Ticker for every input name that could be resolved; names the
+                single-name llm_resolver fails on are left out, so one bad name does not
+                fail the others
+        """
+        resolved = {name: self.lookup(name) for name in company_names}
+        misses = list(dict.fromkeys(name for name, ticker in resolved.items() if ticker is None))
+        if misses and batch_llm_resolver is not None:
+            answers = batch_llm_resolver(misses)
+            for name in misses:
+                if answers.get(name):
+                    resolved[name] = answers[name]
+                    self.remember(name, answers[name])
+        for name, ticker in list(resolved.items()):
+            if ticker is None:
+                try:
+                    resolved[name] = self.resolve(name)
+                except Exception as e:
+                    logger.warning(f"Could not resolve a ticker for {name!r}: {e}")
+                    del resolved[name]
+        return resolved
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and optional JSON persistence.
+
+    Args:
+        max_size: Maximum number of entries kept; least recently used entries are evicted first
+        ttl: Seconds an entry stays valid (None keeps entries until evicted)
+        path: Optional JSON file the cache is loaded from and saved to
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        if self.path:
+            self.save()
+
+    def load(self) -> None:
+        """Load unexpired entries from disk, ignoring a missing or corrupt file."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache file {self.path}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            for key, value, stored_at in stored:
+                if self.ttl is None or now - stored_at <= self.ttl:
+                    self._entries[key] = (value, stored_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """Write the cache atomically so a crash never leaves a half-written file."""
+        with self._lock:
+            stored = [[key, value, stored_at] for key, (value, stored_at) in self._entries.items()]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,240 @@
+import json
+import logging
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+from ticker_resolver import DIRECTORY_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUANTILES = (0.5, 0.75, 0.9)
+
+
+def load_sectors(path: str = DIRECTORY_PATH) -> Dict[str, str]:
+    """Symbol -> sector from the ticker directory."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            directory = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"Ticker directory not found at {path}")
+        return {}
+    return {symbol: entry["sector"] for symbol, entry in directory.items() if "sector" in entry}
+
+
+def group_quantiles(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                    quantiles: Sequence[float]) -> np.ndarray:
+    """
+    Per-group quantiles (linear interpolation, like np.quantile) for all groups at once.
+
+    Args:
+        sorted_values: Values stored as contiguous groups, each group sorted ascending
+        starts: Offset of every group's first value
+        counts: Number of values in every group (all > 0)
+        quantiles: Quantiles in [0, 1]
+
+    Returns:
+        np.ndarray: Shape (n_groups, len(quantiles))
+    """
+    positions = np.asarray(quantiles, dtype=np.float64)[None, :] * (counts - 1)[:, None]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    lo_values = sorted_values[starts[:, None] + lower]
+    hi_values = sorted_values[starts[:, None] + upper]
+    return lo_values + (hi_values - lo_values) * (positions - lower)
+
+
+class VolumeBayesEngine:
+    """
+    P(price increase | high volume) and related conditional probabilities for every symbol.
+
+    A bar is "up" when its close beats the symbol's previous close and "high volume"
+    when its volume exceeds the symbol's volume quantile. Everything is computed with
+    group offsets and bincounts over the store's (Symbol, Date)-sorted columns, so the
+    full symbol x quantile matrix costs a few array passes instead of a filter per ticker.
+
+    Args:
+        store: Price store to read bars from
+        sectors: Symbol -> sector mapping used by by_sector()
+    """
+
+    def __init__(self, store: PriceStore, sectors: Optional[Dict[str, str]] = None):
+        self.store = store
+        self.sectors = sectors if sectors is not None else load_sectors()
+        self._prepared_for = None
+
+    def _prepare(self) -> None:
+        """Derive group indices and up/valid flags; redone only when the store has reloaded."""
+        if self._prepared_for is self.store.dates:
+            return
+        symbols = self.store.symbol_array
+        self.volume = self.store.columns["Volume"].astype(np.float64)
+        close = self.store.columns["Close"].astype(np.float64)
+
+        # Bars are sorted by symbol, so groups are contiguous runs; the first bar
+        # of each symbol has no previous close to compare with
+        self.valid = np.zeros(len(symbols), dtype=bool)
+        self.valid[1:] = symbols[1:] == symbols[:-1]
+        self.up = np.zeros(len(symbols), dtype=bool)
+        self.up[1:] = close[1:] > close[:-1]
+        self.up &= self.valid
+
+        self.starts = np.flatnonzero(~self.valid)
+        self.group_names = symbols[self.starts]
+        self.groups = np.cumsum(~self.valid) - 1
+        self.group_sizes = np.diff(np.append(self.starts, len(symbols)))
+        # Thresholds for any quantile are then just offsets into each symbol's sorted run
+        self.sorted_volume = self.volume[np.lexsort((self.volume, self.groups))]
+        self._prepared_for = self.store.dates
+
+    def _high_volume(self, quantiles: Sequence[float]):
+        thresholds = group_quantiles(self.sorted_volume, self.starts, self.group_sizes, quantiles)
+        return thresholds, self.volume[:, None] > thresholds[self.groups]
+
+    def _counts(self, quantiles: Sequence[float]) -> Dict[str, np.ndarray]:
+        """Bar counts per (symbol, quantile), summed over each symbol's contiguous run."""
+        thresholds, high = self._high_volume(quantiles)
+        high &= self.valid[:, None]
+        up_high = high & self.up[:, None]
+        n_q = len(quantiles)
+
+        def per_symbol(flags: np.ndarray) -> np.ndarray:
+            return np.add.reduceat(flags.astype(np.int64), self.starts, axis=0)
+
+        return {
+            "thresholds": thresholds,
+            "bars": np.repeat(per_symbol(self.valid)[:, None], n_q, axis=1),
+            "up": np.repeat(per_symbol(self.up)[:, None], n_q, axis=1),
+            "high": per_symbol(high),
+            "up_high": per_symbol(up_high),
+        }
+
+    @staticmethod
+    def _probabilities(counts: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bars, up, high, up_high = counts["bars"], counts["up"], counts["high"], counts["up_high"]
+            p_up = up / bars
+            p_up_given_high = up_high / high
+            return {
+                "bars": bars,
+                "high_volume_bars": high,
+                "p_up": p_up,
+                "p_high": high / bars,
+                "p_up_given_high": p_up_given_high,
+                "p_up_given_low": (up - up_high) / (bars - high),
+                "p_high_given_up": up_high / up,
+                "lift": p_up_given_high / p_up,
+            }
+
+    def _to_frame(self, index_name: str, names: np.ndarray, quantiles: Sequence[float],
+                  columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        n_q = len(quantiles)
+        frame = pd.DataFrame({
+            index_name: np.repeat(names, n_q),
+            "quantile": np.tile(np.asarray(quantiles, dtype=np.float64), len(names)),
+        })
+        for column, values in columns.items():
+            frame[column] = values.reshape(-1)
+        return frame
+
+    def conditional_matrix(self, quantiles: Sequence[float] = DEFAULT_QUANTILES,
+                           symbols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        One row per (symbol, volume quantile) with P(up | high volume) and companions.
+
+        Returns:
+            pd.DataFrame: Symbol, quantile, threshold, bars, high_volume_bars, p_up, p_high,
+                p_up_given_high, p_up_given_low, p_high_given_up, lift
+        """
+        self._prepare()
+        counts = self._counts(quantiles)
+        columns = {"threshold": counts["thresholds"], **self._probabilities(counts)}
+        frame = self._to_frame("Symbol", self.group_names, quantiles, columns)
+        if symbols is not None:
+            frame = frame[frame["Symbol"].isin(symbols)].reset_index(drop=True)
+        return frame
+
+    def by_sector(self, quantiles: Sequence[float] = DEFAULT_QUANTILES) -> pd.DataFrame:
+        """
+        Sector-level probabilities, pooling the bars of every symbol in the sector.
+
+        High volume is still judged against each symbol's own threshold, so large
+        caps do not mark every bar of small caps as low volume. Symbols without a
+        sector are pooled under "Other".
+        """
+        self._prepare()
+        sector_of_group = np.array([self.sectors.get(symbol, "Other") for symbol in self.group_names])
+        sector_names, sector_codes = np.unique(sector_of_group, return_inverse=True)
+        counts = {
+            name: np.stack([
+                np.bincount(sector_codes, weights=values[:, q], minlength=len(sector_names))
+                for q in range(len(quantiles))
+            ], axis=1).astype(np.int64)
+            for name, values in self._counts(quantiles).items() if name != "thresholds"
+        }
+        columns = self._probabilities(counts)
+        columns["symbols"] = np.repeat(np.bincount(sector_codes, minlength=len(sector_names))[:, None], len(quantiles), axis=1)
+        return self._to_frame("Sector", sector_names, quantiles, columns)
+
+    def rolling(self, quantile: float = 0.75, window: int = 26,
+                symbols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        P(up | high volume) over the trailing ``window`` bars of each symbol, at every bar.
+
+        Window sums come from one cumulative sum per indicator, clipped at each
+        symbol's first bar, so the cost is O(bars) regardless of the window length.
+        The volume threshold is the symbol's full-sample quantile.
+
+        Returns:
+            pd.DataFrame: Date, Symbol, high_volume_bars, p_up, p_up_given_high
+        """
+        self._prepare()
+        _, high = self._high_volume([quantile])
+        high = high[:, 0] & self.valid
+        n = len(self.groups)
+        positions = np.arange(n)
+        lower = np.maximum(positions - window + 1, self.starts[self.groups])
+
+        def window_sum(flags: np.ndarray) -> np.ndarray:
+            cumulative = np.concatenate(([0], np.cumsum(flags)))
+            return cumulative[positions + 1] - cumulative[lower]
+
+        bars = window_sum(self.valid)
+        highs = window_sum(high)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frame = pd.DataFrame({
+                "Date": self.store.dates,
+                "Symbol": self.store.symbol_array,
+                "high_volume_bars": highs,
+                "p_up": window_sum(self.up) / bars,
+                "p_up_given_high": window_sum(self.up & high) / highs,
+            })
+        if symbols is not None:
+            frame = frame[frame["Symbol"].isin(symbols)].reset_index(drop=True)
+        return frame
+
+
+if __name__ == "__main__":
+    # Synthetic benchmark: full matrix for thousands of tickers
+    import time
+
+    n_symbols, n_weeks = 5000, 104
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "Date": np.tile(pd.date_range("2023-01-06", periods=n_weeks, freq="W-FRI").strftime("%Y-%m-%d"), n_symbols),
+        "Symbol": np.repeat([f"S{i:05d}" for i in range(n_symbols)], n_weeks),
+        "Close": 100 * np.exp(np.cumsum(rng.normal(0, 0.03, n_symbols * n_weeks))),
+        "Volume": rng.lognormal(16, 0.5, n_symbols * n_weeks).astype(np.int64),
+    })
+    engine = VolumeBayesEngine(PriceStore(frame), sectors={})
+
+    for label, run in [
+        ("conditional_matrix (3 quantiles)", lambda: engine.conditional_matrix()),
+        ("rolling (26 weeks)", lambda: engine.rolling()),
+        ("by_sector", lambda: engine.by_sector()),
+    ]:
+        start = time.perf_counter()
+        result = run()
+        print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms, {len(result)} rows")
@@ -1,5 +1,9 @@
 import yfinance as yf
 import pandas as pd
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from backend.price_store import write_prices
 
 # Sectors and companies
 sectors = {
@@ -20,49 +24,95 @@ sectors = {
     ]
 }
 
-# Function to fetch stock price data
-def fetch_stock_data(symbol):
-    stock = yf.Ticker(symbol)
-    # Fetch historical data for the last 5 years
-    hist = stock.history(period="2y")
-
-    hist['Symbol'] = symbol  # Add the stock symbol as a column
-
-    weekly_data = hist.resample('W-FRI').agg({
-        'Open': 'first',       
-        'High': 'max',         
-        'Low': 'min',          
-        'Close': 'last',       
-        'Volume': 'sum',       
-        'Dividends': 'sum',   
-        'Stock Splits': 'sum'  
-    })
-    
+# Weekly bar aggregation applied to daily history
+WEEKLY_AGG = {
+    'Open': 'first',       
+    'High': 'max',         
+    'Low': 'min',          
+    'Close': 'last',       
+    'Volume': 'sum',       
+    'Dividends': 'sum',   
+    'Stock Splits': 'sum'  
+}
+COLUMNS = ['Date', 'Symbol', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# Default fetcher: daily history for one symbol from yfinance (from `start` if given, else `period`)
+def yfinance_fetcher(symbol, period="2y", start=None):
+    if start is not None:
+        return yf.Ticker(symbol).history(start=start)
+    return yf.Ticker(symbol).history(period=period)
+
+# Resample daily history (DatetimeIndex) to Friday-ending weekly bars
+def resample_weekly(hist, symbol):
+    weekly_data = hist.resample('W-FRI').agg(WEEKLY_AGG)
     weekly_data.reset_index(inplace=True)
-    
     weekly_data['Symbol'] = symbol
-    
-    return weekly_data[['Date', 'Symbol', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']]
+    return weekly_data[COLUMNS]
 
-# Main function to fetch stock data for all companies
-def fetch_stock_data_for_all_companies(sectors):
-    all_stock_data = []
+# Function to fetch stock price data
+def fetch_stock_data(symbol, fetcher=yfinance_fetcher):
+    # Fetch historical data for the last 2 years
+    hist = fetcher(symbol)
+    return resample_weekly(hist, symbol)
+
+# Rounding 6 decimal places to 3, in one vectorized pass over the numeric columns
+def round_prices(df):
+    return df.round(dict.fromkeys(df.select_dtypes("number").columns, 3))
+
+# Fetch one symbol, retrying failures with exponential backoff
+def fetch_with_retry(symbol, fetcher=yfinance_fetcher, retries=3, backoff=1.0):
+    for attempt in range(retries + 1):
+        try:
+            return fetch_stock_data(symbol, fetcher)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt
+            print(f"Fetching {symbol} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
 
-    for sector, companies in sectors.items():
-        print(f"Fetching data for sector: {sector}")
-        for symbol in companies:
-            print(f"Fetching stock data for {symbol}")
-            stock_data = fetch_stock_data(symbol)
-            all_stock_data.append(stock_data)
+# Main function to fetch stock data for all companies
+def fetch_stock_data_for_all_companies(sectors, fetcher=yfinance_fetcher, max_workers=8,
+                                       retries=3, backoff=1.0, partition_dir=None, parquet_dir=None):
+    """
+    Fetch weekly bars for every company concurrently.
+
+    Args:
+        sectors: Mapping of sector name to ticker symbols
+        fetcher: Callable returning daily history for a symbol (swap in a fake source for tests)
+        max_workers: Maximum number of concurrent fetches
+        retries: Retries per symbol before it is reported as failed
+        backoff: Base delay in seconds, doubled after each failed attempt
+        partition_dir: If set, each symbol is written to <partition_dir>/<SYMBOL>_data.csv as soon as it completes
+        parquet_dir: If set, each symbol is upserted into the Parquet dataset (Symbol=/Year= partitions) as soon as it completes
+
+    Returns:
+        DataFrame of all symbols in sector order, prices rounded to 3 decimals
+    """
+    symbols = [symbol for companies in sectors.values() for symbol in companies]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch_with_retry, symbol, fetcher, retries, backoff): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                stock_data = future.result()
+            except Exception as e:
+                print(f"Failed to fetch stock data for {symbol}: {e}")
+                continue
+            print(f"Fetched stock data for {symbol}")
+            results[symbol] = stock_data
+            if partition_dir:
+                os.makedirs(partition_dir, exist_ok=True)
+                round_prices(stock_data).to_csv(os.path.join(partition_dir, f"{symbol}_data.csv"), index=False)
+            if parquet_dir:
+                write_prices(round_prices(stock_data), parquet_dir)
 
     # Combine all stock data into one DataFrame
-    combined_stock_data = pd.concat(all_stock_data, ignore_index=True)
-
-    # Rounding 6 decimal places to 3
-    for i in list(combined_stock_data.columns.values):
-        combined_stock_data[i] = combined_stock_data[i].round(3)
+    combined_stock_data = pd.concat([results[symbol] for symbol in symbols if symbol in results], ignore_index=True)
 
-    return combined_stock_data
+    return round_prices(combined_stock_data)
 
 # # Fetch stock data for all companies
 # stock_data = fetch_stock_data_for_all_companies(sectors)
@@ -72,51 +122,96 @@ def fetch_stock_data_for_all_companies(sectors):
 
 # print("Stock data fetching completed and saved to 'stock_data.csv'.")
 
+# Date of the last bar in a stored CSV, read from the file tail without parsing the whole file
+def read_last_date(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = [line for line in f.read().decode("utf-8").splitlines() if line.strip()]
+    if not lines:
+        return None
+    last_date = lines[-1].split(",", 1)[0][:10]
+    return None if last_date == "Date" else pd.Timestamp(last_date)
+
+# Replace every stored row dated on/after the first new row, then append the new rows
+def upsert_csv(path, new_rows):
+    first_new = str(new_rows['Date'].iloc[0])[:10]
+    with open(path, "rb+") as f:
+        lines = f.readlines()
+        keep = len(lines)
+        while keep > 1 and lines[keep - 1].decode("utf-8").split(",", 1)[0][:10] >= first_new:
+            keep -= 1
+        f.seek(sum(len(line) for line in lines[:keep]))
+        f.truncate()
+        if keep and not lines[keep - 1].endswith(b"\n"):
+            f.write(b"\n")
+    new_rows.to_csv(path, mode="a", header=False, index=False)
+
 class PostData:
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, data_dir: str = "./Data", fetcher=yfinance_fetcher, parquet_dir=None):
         self.sym = symbol
+        self.path = os.path.join(data_dir, f"{symbol}_data.csv")
+        self.fetcher = fetcher
+        self.parquet_dir = parquet_dir  # Also upsert saved weeks into this Parquet dataset
 
-    def fetch_stock_data(self) -> pd.DataFrame:
-        stock = yf.Ticker(self.sym)
-        # Fetch historical data for the last 2 years
-        hist = stock.history(period="2y")
-        hist.reset_index(inplace=True)
-        hist['Symbol'] = self.sym  # Add the stock symbol as a column
-        weekly_data = hist.resample('W-FRI').agg({
-        'Open': 'first',       
-        'High': 'max',         
-        'Low': 'min',          
-        'Close': 'last',       
-        'Volume': 'sum',       
-        'Dividends': 'sum',   
-        'Stock Splits': 'sum'  
-    })
-    
-        weekly_data.reset_index(inplace=True)
-        
-        weekly_data['Symbol'] = self.sym
-        
-        return weekly_data[['Date', 'Symbol', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']]
-
-    def get_data(self) -> pd.DataFrame:
-        stock_data = []
-        
-        print(f"Fetching data for Company: {self.sym}")
-        data = fetch_stock_data(self.sym)
-        stock_data.append(data)
-        combined_stock_data = pd.concat(stock_data, ignore_index=True)
-
-        # Rounding 6 decimal places to 3
-        for i in list(combined_stock_data.columns.values):
-            combined_stock_data[i] = combined_stock_data[i].round(3)
+    def fetch_stock_data(self, start=None) -> pd.DataFrame:
+        # Fetch the last 2 years, or only from `start` when updating incrementally
+        hist = self.fetcher(self.sym) if start is None else self.fetcher(self.sym, start=start)
+        return resample_weekly(hist, self.sym)
 
-        return combined_stock_data
+    def get_data(self, start=None) -> pd.DataFrame:
+        print(f"Fetching data for Company: {self.sym}")
+        return round_prices(self.fetch_stock_data(start))
+
+    def get_new_data(self) -> pd.DataFrame:
+        """
+        Fetch only the weeks missing from the stored file.
+
+        The last stored week may have been partial, so it is re-fetched from its
+        first day; everything before it is left untouched.
+        """
+        last_date = read_last_date(self.path)
+        if last_date is None:
+            return self.get_data()
+        # W-FRI weeks run Saturday..Friday, so start on the Saturday before the last stored Friday
+        return self.get_data(start=(last_date - pd.Timedelta(days=6)).strftime("%Y-%m-%d"))
     
-    def save_data(self):
+    def save_data(self, incremental: bool = True):
+        if incremental and read_last_date(self.path) is not None:
+            data = self.get_new_data()
+            if data.empty:
+                print(f"No new stock data for {self.sym}.")
+                return data
+            upsert_csv(self.path, data)
+            if self.parquet_dir:
+                write_prices(data, self.parquet_dir)
+            print(f"Updated {len(data)} weeks of stock data for {self.sym} in '{self.path}'.")
+            return data
+
         data = self.get_data()
-        data.to_csv(f'./Data/{self.sym}_data.csv', index=False)
-        print(f"Stock data for {self.sym} saved to './Data/{self.sym}_data.csv'.")
+        data.to_csv(self.path, index=False)
+        if self.parquet_dir:
+            write_prices(data, self.parquet_dir)
+        print(f"Stock data for {self.sym} saved to '{self.path}'.")
+        return data
+
+# Incrementally update the per-symbol files for every company
+def update_all_companies(sectors, data_dir="./Data", fetcher=yfinance_fetcher, max_workers=8, parquet_dir=None):
+    symbols = [symbol for companies in sectors.values() for symbol in companies]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(PostData(symbol, data_dir, fetcher, parquet_dir).save_data): symbol for symbol in symbols}
+        updated = {}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                updated[symbol] = future.result()
+            except Exception as e:
+                print(f"Failed to update stock data for {symbol}: {e}")
+    return updated
 
 # Example usage
-post = PostData("AMD")
-post.save_data()
\ No newline at end of file
+if __name__ == "__main__":
+    post = PostData("AMD")
+    post.save_data()
\ No newline at end of file
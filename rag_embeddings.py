@@ -1,13 +1,18 @@
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
 import dotenv
+import hashlib
 import os
 import pandas as pd
 import numpy as np
-import faiss
 import logging
 from pathlib import Path
+from typing import TYPE_CHECKING
 from tqdm import tqdm
+from backend.faiss_index import EMBEDDING_MODEL, StockIndexBuilder, build_text_column
+from backend.lazy import LazyResource
+from backend.price_store import read_prices
+
+if TYPE_CHECKING:
+    from pinecone import Pinecone
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,34 +22,174 @@ dotenv.load_dotenv()
 PINECONE_API = os.getenv("PINECONE_API")
 PC_ENV = os.getenv("PINECONE_ENV")
 PATH = "./Data/stock_data.csv"
-# Initialize
-pc = Pinecone(api_key=PINECONE_API)
+PRICES_DIR = "./Data/prices"  # Parquet dataset written by backend/price_store.py
 index_name = "stock-index"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))
+EMBED_PROCESSES = int(os.getenv("EMBED_PROCESSES", "0"))  # >1 encodes with a multi-process CPU pool
+EMBEDDINGS_PATH = "embeddings.npy"
+MANIFEST_PATH = "embeddings_manifest.csv"
+EMBEDDING_CACHE_PATH = "embedding_cache.npz"
+FAISS_INDEX_PATH = "./backend/stock_index.faiss"
+FAISS_INDEX_KIND = os.getenv("FAISS_INDEX_KIND", "flat")  # flat, ivf_flat, hnsw or ivf_pq
+
+
+# Heavy clients are created on first use, so importing this module stays cheap
+def _load_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+def _load_pinecone_index():
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API)
+    return pc.Index(index_name)
 
-pIndex = pc.Index(index_name)
-encoder = SentenceTransformer('all-MiniLM-L6-v2')
+_encoder = LazyResource(_load_encoder)
+_pinecone_index = LazyResource(_load_pinecone_index)
+
+def get_encoder():
+    return _encoder.get()
+
+def get_pinecone_index() -> "Pinecone.Index":
+    return _pinecone_index.get()
 
 def getCSV(Path: str) -> pd.DataFrame:
     df = pd.read_csv(Path)
     return df
 
-def generate_embeddings(row):
-    # Concatenate relevant columns into a single string for embedding
-    text_representation = f"{row['Symbol']} {row['Open']} {row['High']} {row['Low']} {row['Close']} {row['Volume']}"
-    return encoder.encode(text_representation)
+def getPrices(
+    path: str = PRICES_DIR,
+    symbols: list[str] = None,
+    start: str = None,
+    end: str = None,
+    columns: list[str] = None
+) -> pd.DataFrame:
+    """
+    Load bars from the Parquet dataset, pushing symbol/date filters and column projection
+    down to the reader; falls back to the CSV at PATH when the dataset does not exist.
+    """
+    if not Path(path).is_dir():
+        df = getCSV(PATH)
+        if symbols is not None:
+            df = df[df["Symbol"].isin(symbols)]
+        dates = df["Date"].astype(str).str[:10]
+        if start is not None:
+            df = df[dates >= start]
+        if end is not None:
+            df = df[dates <= end]
+        return df[columns].reset_index(drop=True) if columns else df.reset_index(drop=True)
+    return read_prices(path, symbols=symbols, start=start, end=end, columns=columns)
+
+def encode_texts(
+    texts: list[str],
+    batch_size: int = EMBED_BATCH_SIZE,
+    processes: int = EMBED_PROCESSES
+) -> np.ndarray:
+    """
+    Encode texts in large batches, optionally spread over a pool of CPU worker processes.
+    
+    Args:
+        texts: Strings to embed
+        batch_size: Number of texts per encoder call
+        processes: Number of CPU worker processes (0 or 1 encodes in this process)
+        
+    Returns:
+        float32 matrix with one row per text
+    """
+    encoder = get_encoder()
+    if processes > 1:
+        pool = encoder.start_multi_process_pool(target_devices=["cpu"] * processes)
+        try:
+            vectors = encoder.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            encoder.stop_multi_process_pool(pool)
+    else:
+        vectors = encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=True)
+    return np.asarray(vectors, dtype=np.float32)
+
+def save_embeddings(
+    vectors: np.ndarray,
+    data: pd.DataFrame,
+    path: str = EMBEDDINGS_PATH,
+    manifest_path: str = MANIFEST_PATH
+) -> None:
+    """Write vectors as a binary .npy file plus a manifest mapping each row to its (Symbol, Date)."""
+    np.save(path, vectors)
+    manifest = data[["Symbol", "Date"]].copy()
+    manifest.insert(0, "row_id", np.arange(len(data)))
+    manifest.to_csv(manifest_path, index=False)
+    logger.info(f"Saved {len(vectors)} embeddings to {path}")
+
+def load_embeddings(path: str = EMBEDDINGS_PATH, manifest_path: str = MANIFEST_PATH) -> tuple[np.ndarray, pd.DataFrame]:
+    """Memory-map saved vectors and load their row manifest."""
+    return np.load(path, mmap_mode="r"), pd.read_csv(manifest_path)
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by a hash of (model name, text representation).
+    
+    Args:
+        path: .npz file holding the cached keys and vectors
+        model_name: Encoder name, part of every key so switching models never reuses vectors
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model_name: str = EMBEDDING_MODEL):
+        self.path = path
+        self.model_name = model_name
+        self.hits = 0
+        self.misses = 0
+        self.keys: list[str] = []
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        if Path(path).exists():
+            with np.load(path) as stored:
+                self.keys = stored["keys"].tolist()
+                self.vectors = stored["vectors"]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def encode(self, texts: list[str], encode_fn=None) -> np.ndarray:
+        """
+        Return vectors for texts, encoding only those not already cached.
+        
+        Args:
+            texts: Text representations to embed
+            encode_fn: Batch encoder used for misses (defaults to encode_texts)
+            
+        Returns:
+            float32 matrix with one row per text
+        """
+        encode_fn = encode_fn or encode_texts
+        keys = [self.key(text) for text in texts]
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+        self.misses += len(missing)
+        self.hits += len(texts) - sum(1 for key in keys if key in missing)
+
+        if missing:
+            new_vectors = encode_fn(list(missing.values()))
+            start = len(self.keys)
+            self.keys.extend(missing)
+            self._rows.update({key: start + offset for offset, key in enumerate(missing)})
+            self.vectors = new_vectors if start == 0 else np.vstack([self.vectors, new_vectors])
 
-data = getCSV(PATH)
-data["embedding"] = data.apply(generate_embeddings, axis=1)
-embeddings = data["embedding"]
-embeddings.to_csv("embeddings.csv", index=False)
-# embeddings = pd.read_csv("embe 1ddings.csv")
-# embeddings = embeddings["embedding"]
+        return self.vectors[[self._rows[key] for key in keys]]
+
+    def save(self) -> None:
+        """Write the cache atomically next to its final location."""
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, keys=np.array(self.keys), vectors=self.vectors)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(self.keys)} cached embeddings to {self.path}")
 
-print("Data loaded and embeddings generated")
 
 def store_in_pinecone(
     data: pd.DataFrame,
-    index: Pinecone.Index,
+    index: "Pinecone.Index",
     batch_size: int = 100,
     namespace: str = None
 ) -> None:
@@ -101,12 +246,8 @@ def store_in_pinecone(
         logger.error(f"Error storing vectors in Pinecone: {str(e)}")
         raise
 
-
-store_in_pinecone(data, pIndex, batch_size=100, namespace="stocks")
-print("Pinecone stored!")
-
 def search_vectors_pinecone(
-    index: Pinecone.Index,
+    index: "Pinecone.Index",
     query_vector: np.ndarray,
     k: int = 5,
     namespace: str = None,
@@ -145,103 +286,65 @@ def search_vectors_pinecone(
         logger.error(f"Error during vector search: {str(e)}")
         raise
 
-# Example usage:
-query_embedding = encoder.encode("search text")
-results = search_vectors_pinecone(
-    pIndex, 
-    query_embedding, 
-    k=5, 
-    filter={"symbol": "AAPL"}
-)
-
-print(results)
-
-def setup_faiss_index(vector_dimension: int, index_path: str = "stock_index.faiss") -> faiss.IndexFlatL2:
-    """Initialize or load existing FAISS index"""
-    if Path(index_path).exists():
-        logger.info("Loading existing FAISS index")
-        return faiss.read_index(index_path)
-    
-    logger.info("Creating new FAISS index")
-    return faiss.IndexFlatL2(vector_dimension)
 
 def store_in_faiss(
     data: pd.DataFrame,
-    index: faiss.IndexFlatL2,
-    batch_size: int = 100,
-    index_path: str = "stock_index.faiss"
+    vectors: np.ndarray,
+    index_path: str = FAISS_INDEX_PATH,
+    replace: bool = False,
+    kind: str = FAISS_INDEX_KIND
 ) -> None:
     """
-    Store stock data vectors in FAISS index with batch processing.
+    Add stock data vectors to the FAISS index, skipping bars that are already indexed.
     
     Args:
-        data: DataFrame containing stock data with embeddings
-        index: FAISS index instance
-        batch_size: Number of vectors to add in each batch
-        index_path: Path to save the FAISS index
+        data: DataFrame containing stock data, row-aligned with vectors
+        vectors: Embedding matrix
+        index_path: Path to save the FAISS index (metadata goes to a sidecar next to it)
+        replace: Re-embed bars that are already indexed instead of skipping them
+        kind: Index kind used when the index is created (an existing index keeps its own)
     """
     try:
-        batch_vectors = []
-        metadata_list = []
-        
-        for _, row in data.iterrows():
-            vector = row["embedding"].astype(np.float16)
-            metadata = {
-                "date": row["Date"],
-                "symbol": row["Symbol"],
-                "open": float(row["Open"]),
-                "high": float(row["High"]),
-                "low": float(row["Low"]),
-                "close": float(row["Close"]),
-                "volume": int(row["Volume"]),
-                "dividends": float(row["Dividends"]),
-                "stock_splits": float(row["Stock Splits"])
-            }
-            
-            batch_vectors.append(vector)
-            metadata_list.append(metadata)
-            
-            if len(batch_vectors) >= batch_size:
-                vectors_array = np.array(batch_vectors)
-                index.add(vectors_array)
-                logger.info(f"Added batch of {len(batch_vectors)} vectors to FAISS")
-                batch_vectors = []
-        
-        # Process remaining vectors
-        if batch_vectors:
-            vectors_array = np.array(batch_vectors)
-            index.add(vectors_array)
-            logger.info(f"Added final batch of {len(batch_vectors)} vectors to FAISS")
-        
-        # Save index
-        faiss.write_index(index, index_path)
-        logger.info(f"FAISS index saved to {index_path}")
+        builder = StockIndexBuilder(vectors.shape[1], index_path, kind=kind)
+        added = builder.append(data, vectors, replace=replace)
+        if added:
+            builder.save()
+        builder.close()
+        logger.info(f"Added {added} new vectors to {index_path}")
         
     except Exception as e:
         logger.error(f"Error storing vectors in FAISS: {str(e)}")
         raise
 
-# vector_dim = len(data['embedding'].iloc[0])
-# index = setup_faiss_index(vector_dimension=vector_dim)
-
-# store_in_faiss(
-#     data=data,
-#     index=index,
-#     batch_size=100,
-#     index_path="stock_index.faiss"
-# )
-
-# def search_similar(query_vector, k=5):
-#     distances, indices = index.search(
-#         np.array([query_vector]).astype(np.float32), 
-#         k
-#     )
-#     return data.iloc[indices[0]]
-print("storing done")
-# Example search using first vector as query
-# sample_query = data['embedding'].iloc[0]
-# results = search_similar(sample_query)
-# print("\nSearch Results:")
-# print(results[['Symbol', 'Date', 'Close']])
-
-print("Done!")
\ No newline at end of file
+def main():
+    data = getPrices()
+    cache = EmbeddingCache()
+    vectors = cache.encode(build_text_column(data).tolist())
+    cache.save()
+    save_embeddings(vectors, data)
+    data["embedding"] = list(vectors)
+    print("Data loaded and embeddings generated")
+    print(f"Embedding cache: {cache.hits} hits, {cache.misses} misses")
+
+    pIndex = get_pinecone_index()
+    store_in_pinecone(data, pIndex, batch_size=100, namespace="stocks")
+    print("Pinecone stored!")
+
+    # Example usage:
+    query_embedding = get_encoder().encode("search text")
+    results = search_vectors_pinecone(
+        pIndex, 
+        query_embedding, 
+        k=5, 
+        filter={"symbol": "AAPL"}
+    )
+    print(results)
+
+    store_in_faiss(data, vectors)
+    print("storing done")
+    print("Done!")
+
+
+# The guard also keeps multi-process encoding workers from re-running the pipeline
+if __name__ == "__main__":
+    main()